@@ -170,4 +170,5 @@ def main():
     for conference in best_conferences:
         print("{} : {}".format(conference.name(), conference.win_ratio()))
     
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+File: benchmark.py
+Purpose: A benchmark harness for the six CSC120 scripts. It generates
+synthetic input files in each script's format at several scales, times the
+hot function of each script, and records the peak memory each one allocates.
+Profiling is opt-in: per-stage timings can be written to a JSON file and each
+stage can also be run under cProfile.
+
+Usage:
+    python benchmark.py [--scales N ...] [--json PATH] [--profile DIR]
+"""
+import argparse
+import cProfile
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import bball
+import dates
+import fake_news
+import linkedlist_sort
+import pokemon
+import rhymes
+
+# Words for synthetic news titles, with some punctuation to strip
+TITLE_WORDS = ["Trump", "Clinton", "election", "vote", "report", "Russia",
+               "news", "media", "police", "health", "war", "economy",
+               "world", "school", "fake", "tax", "new", "video", "watch",
+               "BREAKING:", "says", "it's", "U.S.", "on", "of", "a", "(VIDEO)"]
+
+CONFERENCES = ["ACC", "Big Ten", "Big 12", "SEC", "Pac-12", "Big East",
+               "Ivy", "Patriot", "MAC", "WCC"]
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep",
+          "Oct", "Nov", "Dec"]
+
+VOWELS = ["AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY",
+          "OW", "OY", "UH", "UW"]
+CONSONANTS = ["B", "CH", "D", "DH", "F", "G", "HH", "JH", "K", "L", "M", "N",
+              "NG", "P", "R", "S", "SH", "T", "TH", "V", "W", "Y", "Z", "ZH"]
+
+def write_news_csv(filename, size, rng):
+    """Writes a news article csv file in the format read by
+    fake_news.process_titles, with the title in the fifth column.
+    """
+    with open(filename, "w", newline="") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["#uuid", "ord_in_thread", "author", "published",
+                         "title"])
+        for number in range(size):
+            title = " ".join(rng.choice(TITLE_WORDS)
+                             for _ in range(rng.randint(4, 12)))
+            writer.writerow([str(number), "0", "author", "2016-10-26",
+                             title])
+
+def write_numbers(filename, size, rng):
+    """Writes a file of integers, ten per line, as read by linkedlist_sort.
+    """
+    with open(filename, "w") as outfile:
+        for start in range(0, size, 10):
+            outfile.write(" ".join(str(rng.randint(-10 ** 6, 10 ** 6))
+                                   for _ in range(min(10, size - start))))
+            outfile.write("\n")
+
+def write_teams(filename, size, rng):
+    """Writes a basketball standings file as read by bball.process_file."""
+    with open(filename, "w") as outfile:
+        outfile.write("# team (conference) wins losses\n")
+        for number in range(size):
+            outfile.write("Team{} ({}) {} {}\n".format(
+                number, rng.choice(CONFERENCES), rng.randint(0, 35),
+                rng.randint(0, 35)))
+
+def make_dates(size, rng):
+    """Returns date strings in the three formats dates.canonicalize_date
+    accepts.
+    """
+    date_strs = []
+    for _ in range(size):
+        year, month, day = rng.randint(1900, 2100), rng.randint(1, 12), \
+        rng.randint(1, 28)
+        form = rng.randrange(3)
+        if form == 0:
+            date_strs.append("{}-{}-{}".format(year, month, day))
+        elif form == 1:
+            date_strs.append("{}/{}/{}".format(month, day, year))
+        else:
+            date_strs.append("{} {} {}".format(MONTHS[month - 1], day, year))
+    return date_strs
+
+def write_roster(filename, size, rng):
+    """Writes a Pokemon csv file as read by pokemon.process_input."""
+    with open(filename, "w") as outfile:
+        outfile.write("#,Name,Type 1,Type 2,Total,HP,Attack,Defense,"
+                      "Sp. Atk,Sp. Def,Speed,Generation,Legendary\n")
+        for pokemon_row in pokemon.make_roster(size, seed=rng.random()):
+            outfile.write(",".join(pokemon_row) + "\n")
+
+def write_pronunciations(filename, size, rng):
+    """Writes a CMU style pronouncing dictionary as read by
+    rhymes.process_input.
+    """
+    with open(filename, "w") as outfile:
+        for number in range(size):
+            phonemes = []
+            for _ in range(rng.randint(2, 8)):
+                if rng.random() < 0.4:
+                    phonemes.append(rng.choice(VOWELS) + rng.choice("012"))
+                else:
+                    phonemes.append(rng.choice(CONSONANTS))
+            outfile.write("W{} {}\n".format(number, " ".join(phonemes)))
+
+def make_stages(directory, scale, seed=120):
+    """Generates the inputs for one scale and returns the stages to measure.
+
+    Args:
+        directory (str): Where to write the input files.
+        scale (int): The number of records in each input.
+        seed (int): The seed for the random inputs so runs are repeatable.
+
+    Returns:
+        list: (name, setup, run) tuples. setup() prepares fresh arguments
+        and run(*arguments) is the part that is timed, so stages that change
+        their input, like sorting, can be run more than once.
+    """
+    rng = random.Random(seed)
+    paths = {}
+    for name, writer in (("news.csv", write_news_csv),
+                         ("numbers.txt", write_numbers),
+                         ("teams.txt", write_teams),
+                         ("pokemon.csv", write_roster),
+                         ("cmudict.txt", write_pronunciations)):
+        paths[name] = os.path.join(directory, "{}-{}".format(scale, name))
+        writer(paths[name], scale, rng)
+    date_strs = make_dates(scale, rng)
+
+    def sort_setup():
+        linked_list = linkedlist_sort.LinkedList()
+        with open(paths["numbers.txt"]) as infile:
+            for numbers in linkedlist_sort.read_number_chunks(infile):
+                linked_list.extend(numbers)
+        return (linked_list,)
+
+    def rhymes_setup():
+        phoneme_dict = rhymes.process_input(paths["cmudict.txt"])
+        words = list(phoneme_dict)[:20]
+        return words, phoneme_dict, rhymes.build_rhyme_index(phoneme_dict)
+
+    def find_rhymes(words, phoneme_dict, rhyme_index):
+        for word in words:
+            rhymes.find_perfect_rhymes(word, phoneme_dict, rhyme_index)
+
+    return [
+        ("fake_news.process_titles", lambda: (paths["news.csv"],),
+         fake_news.process_titles),
+        ("linkedlist_sort.LinkedList.sort", sort_setup,
+         linkedlist_sort.LinkedList.sort),
+        ("bball.process_file", lambda: (paths["teams.txt"],),
+         bball.process_file),
+        ("dates.canonicalize_date", lambda: (date_strs,),
+         lambda strs: [dates.canonicalize_date(date) for date in strs]),
+        ("pokemon.compute_max_averages",
+         lambda: (pokemon.make_dict(pokemon.process_input(
+             paths["pokemon.csv"])),),
+         pokemon.compute_max_averages),
+        ("rhymes.find_perfect_rhymes", rhymes_setup, find_rhymes),
+    ]
+
+def measure(name, setup, run, scale, profile_dir=None):
+    """Times one stage, then runs it again under tracemalloc for its peak
+    memory, so tracing does not slow down the timed run.
+
+    Args:
+        name (str): The stage name.
+        setup (function): Returns the arguments for run.
+        run (function): The code to measure.
+        scale (int): The input scale, for the report.
+        profile_dir (str): If given, the timed run is also profiled with
+        cProfile and its stats are written to this directory.
+
+    Returns:
+        dict: The stage, scale, seconds and peak memory in bytes.
+    """
+    arguments = setup()
+    profiler = cProfile.Profile() if profile_dir else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.runcall(run, *arguments)
+    else:
+        run(*arguments)
+    seconds = time.perf_counter() - start
+    if profiler is not None:
+        profiler.dump_stats(os.path.join(
+            profile_dir, "{}-{}.prof".format(name, scale)))
+
+    arguments = setup()
+    tracemalloc.start()
+    run(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"stage": name, "scale": scale, "seconds": seconds,
+            "peak_bytes": peak}
+
+def run_benchmarks(scales=(1000, 10000), json_path=None, profile_dir=None):
+    """Runs every stage at every scale and prints a table of the results.
+
+    Args:
+        scales (tuple): The input sizes to generate.
+        json_path (str): If given, the results are written to this file as
+        a JSON list.
+        profile_dir (str): If given, cProfile stats for every stage are
+        written to this directory.
+
+    Returns:
+        results (list): One dict per stage and scale, as from measure().
+    """
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            for name, setup, run in make_stages(directory, scale):
+                result = measure(name, setup, run, scale, profile_dir)
+                results.append(result)
+                print("{:<34} {:>8} {:>10.4f}s {:>12} bytes".format(
+                    name, scale, result["seconds"], result["peak_bytes"]))
+    if json_path:
+        with open(json_path, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+    return results
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot functions of the CSC120 scripts.")
+    parser.add_argument("--scales", type=int, nargs="+",
+                        default=[1000, 10000],
+                        help="the input sizes to generate")
+    parser.add_argument("--json", default=None, metavar="PATH",
+                        help="write the per-stage results to PATH as JSON")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="also write cProfile stats for every stage to DIR")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run_benchmarks(args.scales, args.json, args.profile)
@@ -173,4 +173,5 @@ def main():
     filename = input()
     process_infile(filename)
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -300,4 +300,5 @@ def main():
     k = titles_llist.get_nth_highest_count(n)
     titles_llist.print_upto_count(k)
             
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -5,27 +5,64 @@ Course: CSC120 FA 2024
 Purpose: This program is an exercise in implementing a specific sorting
 algorithm for a linked list. The linked list and node classes were given while
 the sort method was left to be implemented. The algorithm returns a sorted 
-linked list in descending order. 
+linked list in descending order. The default strategy is a bottom-up merge
+sort, and the original insertion sort can still be selected for comparison.
+ArrayLinkedList is a lighter alternative that keeps the values and links in
+typed arrays instead of Node objects.
 """
+import argparse
+import heapq
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
 class LinkedList:
     def __init__(self):
         self._head = None
     
     # sort the nodes in the list
-    def sort(self):
+    def sort(self, strategy="merge"):
         """
-        This method returns a descending order sorted linked list by creating 
-        a sorted list that is then referenced by the existing linked list, thus
-        modifying the linked list. It creates a sorted list that maintains
-        descending order rank from each node in the original linked list. 
-        
+        This method sorts the linked list in descending order by relinking
+        its existing nodes, thus modifying the linked list. Nodes holding
+        equal values keep their original relative order.
+
+        Args:
+            strategy (str): The sorting algorithm to use, one of the keys of
+            SORT_STRATEGIES. "merge" is an O(n log n) bottom-up merge sort,
+            "insertion" is the original O(n^2) insertion sort and "radix" is
+            an O(n * w) LSD radix sort for integer values.
+
+        Raises:
+            ValueError: If strategy is not a known sorting strategy.
+
         Returns:
             None
         """
-        # your code goes here
+        if strategy not in SORT_STRATEGIES:
+            raise ValueError("Unknown sort strategy: {}".format(strategy))
         if self._head is None or self._head._next is None:
             return  # No need to sort if the list is empty or has one element
-        
+        getattr(self, SORT_STRATEGIES[strategy])()
+
+    def _insertion_sort(self):
+        """
+        This method creates a sorted list that maintains descending order
+        rank from each node in the original linked list, and then has the
+        existing linked list reference it. Every node rescans the sorted
+        list, so this is O(n^2).
+
+        Returns:
+            None
+        """
         sorted_list = LinkedList()  # Initialize sorted_list as a LinkedList
 
         while self._head is not None:
@@ -52,7 +89,104 @@ class LinkedList:
         
         # Update the original list's head to the sorted list's head
         self._head = sorted_list._head
+
+    def _radix_sort(self):
+        """
+        This method is an LSD radix sort on the integer values. Each pass
+        deals the existing nodes into one chain per digit of RADIX_BITS bits
+        and relinks the chains from the highest digit to the lowest, so
+        every pass is stable and the list ends up in descending order.
+        Values are offset by the smallest value so negative numbers sort
+        correctly. It runs in O(n * w) time for w digits in the range of
+        values and allocates no nodes.
+
+        Returns:
+            None
+        """
+        low = high = self._head._value
+        curr_node = self._head._next
+        while curr_node is not None:
+            if curr_node._value < low:
+                low = curr_node._value
+            elif curr_node._value > high:
+                high = curr_node._value
+            curr_node = curr_node._next
+
+        shift = 0
+        while (high - low) >> shift:
+            heads = [None] * RADIX_SIZE
+            tails = [None] * RADIX_SIZE
+            curr_node = self._head
+            while curr_node is not None:
+                digit = ((curr_node._value - low) >> shift) & RADIX_MASK
+                if tails[digit] is None:
+                    heads[digit] = curr_node
+                else:
+                    tails[digit]._next = curr_node
+                tails[digit] = curr_node
+                curr_node = curr_node._next
+            # Chain the buckets together from the highest digit down
+            head = None
+            tail = None
+            for digit in range(RADIX_MASK, -1, -1):
+                if heads[digit] is not None:
+                    if tail is None:
+                        head = heads[digit]
+                    else:
+                        tail._next = heads[digit]
+                    tail = tails[digit]
+            tail._next = None
+            self._head = head
+            shift += RADIX_BITS
+
+    def _merge_sort(self):
+        """
+        This method is a bottom-up merge sort. It merges neighbouring runs of
+        width 1, 2, 4, ... in place until one run covers the whole list. No
+        recursion is used and no nodes are allocated, so it runs in
+        O(n log n) time and O(1) extra space.
+
+        Returns:
+            None
+        """
+        width = 1
+        while True:
+            head = None
+            tail = None
+            rest = self._head
+            merges = 0
+            while rest is not None:
+                left = rest
+                right = _split_after(left, width)
+                rest = _split_after(right, width)
+                run_head, run_tail = _merge_runs(left, right)
+                # Append the merged run to the list built so far
+                if tail is None:
+                    head = run_head
+                else:
+                    tail._next = run_head
+                tail = run_tail
+                merges += 1
+            self._head = head
+            if merges <= 1:
+                return  # One merge covered the list, so it is sorted
+            width *= 2
         
+    def extend(self, values):
+        """
+        Adds a new node for every value to the head of the list in turn,
+        exactly as calling add(Node(value)) once per value would.
+
+        Args:
+            values (iterable): The integers to add.
+        """
+        head = self._head
+        for value in values:
+            node = Node(value)
+            node._next = head
+            head = node
+        self._head = head
+
     # add a node to the head of the list
     def add(self, node):
         node._next = self._head
@@ -72,16 +206,31 @@ class LinkedList:
         node2._next = node1._next
         node1._next = node2
     
-    def __str__(self):
-        string = 'List[ '
+    # yield the values from the head of the list to the tail
+    def values(self):
         curr_node = self._head
-        while curr_node != None:
-            string += str(curr_node)
-            curr_node = curr_node.next()
-        string += ']'
-        return string
+        while curr_node is not None:
+            yield curr_node._value
+            curr_node = curr_node._next
+
+    def write(self, outfile):
+        """
+        Writes the same text as str(self) to outfile in chunks, so the whole
+        rendering of a long list is never built as one string.
+
+        Args:
+            outfile (file): An open text file to write to.
+        """
+        write_list(self.values(), outfile)
+
+    def __str__(self):
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
 
 class Node:
+    __slots__ = ("_value", "_next")
+
     def __init__(self, value):
         self._value = value
         self._next = None
@@ -95,22 +244,777 @@ class Node:
     def next(self):
         return self._next
 
-def main():
-    # Initialize linked list, input file, and Python list
-    linked_list = LinkedList()
+class ArrayLinkedList:
+    """
+    A linked list stored in two parallel typed arrays instead of Node
+    objects. Slot i holds a value in _values[i] and the slot of the next
+    value in _links[i], with NIL marking the end of the list. Slots freed by
+    remove() are chained into a free list and reused by later adds.
+
+    Values are passed in and returned directly, and the slot index returned
+    by add() and insert() takes the place of a node reference. Values must
+    fit in a signed 64 bit integer; adding one that does not raises
+    OverflowError and leaves the list unchanged.
+    """
+    def __init__(self):
+        self._values = array("q")
+        self._links = array("l")
+        self._head = NIL
+        self._free = NIL
+
+    def _new_slot(self, value):
+        if self._free != NIL:
+            slot = self._free
+            self._values[slot] = value
+            self._free = self._links[slot]
+            return slot
+        self._values.append(value)
+        self._links.append(NIL)
+        return len(self._values) - 1
+
+    # add a value to the head of the list and return its slot
+    def add(self, value):
+        slot = self._new_slot(value)
+        self._links[slot] = self._head
+        self._head = slot
+        return slot
+
+    def extend(self, values):
+        """
+        Adds every value to the head of the list in turn, exactly as calling
+        add() once per value would, but fills the arrays in bulk.
+
+        Args:
+            values (iterable): The integers to add.
+
+        Raises:
+            OverflowError: If a value does not fit in 64 bits. No value is
+            added then.
+        """
+        # Convert every value before touching the list, so a value out of
+        # range cannot leave _values and _links different lengths
+        new_values = array("q", values)
+        if not new_values:
+            return
+        first = len(self._values)
+        self._values.extend(new_values)
+        last = len(self._values)
+        # Each new slot links to the slot added just before it
+        self._links.append(self._head)
+        self._links.extend(range(first, last - 1))
+        self._head = last - 1
+
+    # remove the value at the head of the list and return the value
+    def remove(self):
+        assert self._head != NIL
+        slot = self._head
+        self._head = self._links[slot]
+        self._links[slot] = self._free
+        self._free = slot
+        return self._values[slot]
+
+    # insert value after the value held in slot and return the new slot
+    def insert(self, slot, value):
+        assert slot != NIL
+        new_slot = self._new_slot(value)
+        self._links[new_slot] = self._links[slot]
+        self._links[slot] = new_slot
+        return new_slot
+
+    def sort(self, strategy="merge"):
+        """
+        This method sorts the list in descending order by rewriting the links
+        between slots. The values never move, and equal values keep their
+        original relative order, exactly like LinkedList.sort().
+
+        Args:
+            strategy (str): The sorting algorithm to use, one of the keys of
+            SORT_STRATEGIES.
+
+        Raises:
+            ValueError: If strategy is not a known sorting strategy.
+
+        Returns:
+            None
+        """
+        if strategy not in SORT_STRATEGIES:
+            raise ValueError("Unknown sort strategy: {}".format(strategy))
+        if self._head == NIL or self._links[self._head] == NIL:
+            return
+        getattr(self, SORT_STRATEGIES[strategy])()
+
+    def _insertion_sort(self):
+        values = self._values
+        links = self._links
+        sorted_head = NIL
+        while self._head != NIL:
+            slot = self._head
+            self._head = links[slot]
+            value = values[slot]
+            if sorted_head == NIL or values[sorted_head] < value:
+                links[slot] = sorted_head
+                sorted_head = slot
+            else:
+                current = sorted_head
+                while links[current] != NIL and \
+                values[links[current]] >= value:
+                    current = links[current]
+                links[slot] = links[current]
+                links[current] = slot
+        self._head = sorted_head
+
+    def _radix_sort(self):
+        """
+        The same LSD radix sort as LinkedList._radix_sort(), working on
+        slot indices.
+        """
+        values = self._values
+        links = self._links
+        low = high = values[self._head]
+        slot = links[self._head]
+        while slot != NIL:
+            if values[slot] < low:
+                low = values[slot]
+            elif values[slot] > high:
+                high = values[slot]
+            slot = links[slot]
+
+        shift = 0
+        while (high - low) >> shift:
+            heads = [NIL] * RADIX_SIZE
+            tails = [NIL] * RADIX_SIZE
+            slot = self._head
+            while slot != NIL:
+                digit = ((values[slot] - low) >> shift) & RADIX_MASK
+                if tails[digit] == NIL:
+                    heads[digit] = slot
+                else:
+                    links[tails[digit]] = slot
+                tails[digit] = slot
+                slot = links[slot]
+            head = NIL
+            tail = NIL
+            for digit in range(RADIX_MASK, -1, -1):
+                if heads[digit] != NIL:
+                    if tail == NIL:
+                        head = heads[digit]
+                    else:
+                        links[tail] = heads[digit]
+                    tail = tails[digit]
+            links[tail] = NIL
+            self._head = head
+            shift += RADIX_BITS
+
+    def _merge_sort(self):
+        """
+        The same bottom-up merge sort as LinkedList._merge_sort(), working
+        on slot indices.
+        """
+        values = self._values
+        links = self._links
+        width = 1
+        while True:
+            head = NIL
+            tail = NIL
+            rest = self._head
+            merges = 0
+            while rest != NIL:
+                # Cut the left and right runs off the front of the rest
+                left = rest
+                node = left
+                steps = width
+                while steps > 1 and links[node] != NIL:
+                    node = links[node]
+                    steps -= 1
+                right = links[node]
+                links[node] = NIL
+                rest = NIL
+                if right != NIL:
+                    node = right
+                    steps = width
+                    while steps > 1 and links[node] != NIL:
+                        node = links[node]
+                        steps -= 1
+                    rest = links[node]
+                    links[node] = NIL
+                # Merge the two runs onto the end of the list built so far
+                while left != NIL and right != NIL:
+                    if values[left] >= values[right]:
+                        node = left
+                        left = links[left]
+                    else:
+                        node = right
+                        right = links[right]
+                    if tail == NIL:
+                        head = node
+                    else:
+                        links[tail] = node
+                    tail = node
+                node = left if left != NIL else right
+                if tail == NIL:
+                    head = node
+                else:
+                    links[tail] = node
+                while links[node] != NIL:
+                    node = links[node]
+                tail = node
+                merges += 1
+            self._head = head
+            if merges <= 1:
+                return
+            width *= 2
+
+    # yield the values from the head of the list to the tail
+    def values(self):
+        values = self._values
+        links = self._links
+        slot = self._head
+        while slot != NIL:
+            yield values[slot]
+            slot = links[slot]
+
+    def write(self, outfile):
+        write_list(self.values(), outfile)
+
+    def __str__(self):
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+def write_list(values, outfile, chunk_size=4096):
+    """
+    Writes values to outfile in the "List[ v; v; ]" format used when a
+    linked list is printed, chunk_size values at a time.
+
+    Args:
+        values (iterable): The integers to write, in order.
+        outfile (file): An open text file to write to.
+        chunk_size (int): How many values to render per write.
+    """
+    outfile.write('List[ ')
+    values = iter(values)
+    while True:
+        chunk = [str(value) for value in islice(values, chunk_size)]
+        if not chunk:
+            break
+        outfile.write("; ".join(chunk) + "; ")
+    outfile.write(']')
+
+# Marks the end of a chain of slots in an ArrayLinkedList
+NIL = -1
+
+# Maps each backend name to the list class that implements it
+BACKENDS = {
+    "node": LinkedList,
+    "array": ArrayLinkedList,
+}
+
+# Maps each sort strategy name to the LinkedList method that implements it
+SORT_STRATEGIES = {
+    "merge": "_merge_sort",
+    "insertion": "_insertion_sort",
+    "radix": "_radix_sort",
+}
+
+# The radix sort deals nodes into 2 ** RADIX_BITS buckets per pass
+RADIX_BITS = 8
+RADIX_SIZE = 1 << RADIX_BITS
+RADIX_MASK = RADIX_SIZE - 1
+
+def _split_after(node, width):
+    """
+    Cuts a chain of nodes after its first width nodes.
+
+    Args:
+        node (Node): The first node of the chain, may be None.
+        width (int): How many nodes to keep in the first chain.
+
+    Returns:
+        Node: The first node of the remainder, or None if nothing is left.
+    """
+    while node is not None and width > 1:
+        node = node._next
+        width -= 1
+    if node is None:
+        return None
+    rest = node._next
+    node._next = None
+    return rest
+
+def _merge_runs(left, right):
+    """
+    Merges two descending chains of nodes into one descending chain. When
+    values are equal the node from the left chain goes first, which keeps
+    the merge stable.
+
+    Args:
+        left (Node): The first node of the earlier chain.
+        right (Node): The first node of the later chain, may be None.
+
+    Returns:
+        tuple: The head and the tail node of the merged chain.
+    """
+    if right is None or left._value >= right._value:
+        head = left
+        left = left._next
+    else:
+        head = right
+        right = right._next
+    tail = head
+    while left is not None and right is not None:
+        if left._value >= right._value:
+            tail._next = left
+            tail = left
+            left = left._next
+        else:
+            tail._next = right
+            tail = right
+            right = right._next
+    # Attach whichever chain still has nodes
+    tail._next = left if left is not None else right
+    while tail._next is not None:
+        tail = tail._next
+    return head, tail
+
+def benchmark_sorts(sizes=(1000, 2000, 4000), strategies=None, seed=120):
+    """
+    Times each sort strategy on lists of random integers and prints a small
+    table of the results.
+
+    Args:
+        sizes (tuple): The list lengths to time.
+        strategies (list): The strategy names to compare, every strategy in
+        SORT_STRATEGIES by default.
+        seed (int): The seed for the random values so runs are repeatable.
+
+    Returns:
+        results (dict): Maps (strategy, size) to the sort time in seconds.
+    """
+    if strategies is None:
+        strategies = list(SORT_STRATEGIES)
+    rng = random.Random(seed)
+    results = {}
+    for size in sizes:
+        values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(size)]
+        for strategy in strategies:
+            linked_list = LinkedList()
+            for value in values:
+                linked_list.add(Node(value))
+            start = time.perf_counter()
+            linked_list.sort(strategy)
+            results[(strategy, size)] = time.perf_counter() - start
+            print("{:>10} {:>9} {:.6f}s".format(strategy, size,
+                                                 results[(strategy, size)]))
+    return results
+
+def _build_backend(backend, values):
+    if backend == "node":
+        linked_list = LinkedList()
+        for value in values:
+            linked_list.add(Node(value))
+    else:
+        linked_list = ArrayLinkedList()
+        linked_list.extend(values)
+    return linked_list
+
+def benchmark_backends(sizes=(10000, 100000), seed=120):
+    """
+    Compares the Node based LinkedList with the ArrayLinkedList. For each
+    size it measures the peak memory used while building the list and the
+    time taken to build and to sort it, and prints a small table.
+
+    Args:
+        sizes (tuple): The list lengths to measure.
+        seed (int): The seed for the random values so runs are repeatable.
+
+    Returns:
+        results (dict): Maps (backend, size) to a dict with the keys
+        "memory" (bytes), "build" (seconds) and "sort" (seconds).
+    """
+    rng = random.Random(seed)
+    results = {}
+    for size in sizes:
+        values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(size)]
+        for backend in ("node", "array"):
+            # Measure memory and time in separate passes, since tracing
+            # allocations slows the build down
+            tracemalloc.start()
+            linked_list = _build_backend(backend, values)
+            memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del linked_list
+            start = time.perf_counter()
+            linked_list = _build_backend(backend, values)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            linked_list.sort()
+            sort = time.perf_counter() - start
+            results[(backend, size)] = {"memory": memory, "build": build,
+                                        "sort": sort}
+            print("{:>6} {:>9} {:>12} bytes  build {:.4f}s ({:.0f}/s)  "
+                  "sort {:.4f}s".format(backend, size, memory, build,
+                                        size / build, sort))
+    return results
+
+def read_number_chunks(infile, chunk_size=1 << 20):
+    """
+    Reads the integers in a file a buffer at a time. Each buffer of at most
+    chunk_size characters is split and converted in one pass, so there is
+    no per-line or per-token Python work, and a file holding millions of
+    numbers on a single line is never loaded all at once.
+
+    Args:
+        infile (file): An open text file of whitespace separated integers.
+        chunk_size (int): How many characters to read at a time.
+
+    Yields:
+        list: The integers parsed from the next buffer.
+    """
+    partial = ""
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        tokens = (partial + chunk).split()
+        # The last token may continue in the next chunk
+        if tokens and not chunk[-1].isspace():
+            partial = tokens.pop()
+        else:
+            partial = ""
+        if tokens:
+            yield list(map(int, tokens))
+    if partial:
+        yield [int(partial)]
+
+def read_numbers(infile, chunk_size=1 << 16):
+    """
+    Yields the integers in a file one at a time, reading it with
+    read_number_chunks().
+
+    Args:
+        infile (file): An open text file of whitespace separated integers.
+        chunk_size (int): How many characters to read at a time.
+
+    Yields:
+        int: The next integer in the file.
+    """
+    for numbers in read_number_chunks(infile, chunk_size):
+        yield from numbers
+
+def benchmark_io(sizes=(100000, 200000, 400000), seed=120):
+    """
+    Compares the original per-token ingest and string concatenation output
+    with the buffered read_number_chunks()/extend() ingest and the chunked
+    write(), and prints a small table. Both paths should grow linearly.
+
+    Args:
+        sizes (tuple): How many integers to ingest and print.
+        seed (int): The seed for the random values so runs are repeatable.
+
+    Returns:
+        results (dict): Maps (path, size) to a dict with the keys "ingest"
+        and "print" in seconds.
+    """
+    rng = random.Random(seed)
+    results = {}
+    for size in sizes:
+        text = " ".join(str(rng.randint(-10 ** 6, 10 ** 6))
+                        for _ in range(size))
+        # The original path: one int() and Node() per token, += rendering
+        start = time.perf_counter()
+        linked_list = LinkedList()
+        for line in io.StringIO(text):
+            for num in line.strip().split():
+                linked_list.add(Node(int(num)))
+        ingest = time.perf_counter() - start
+        start = time.perf_counter()
+        string = 'List[ '
+        curr_node = linked_list._head
+        while curr_node is not None:
+            string += str(curr_node)
+            curr_node = curr_node._next
+        string += ']'
+        results[("token", size)] = {"ingest": ingest,
+                                    "print": time.perf_counter() - start}
+        # The bulk path
+        start = time.perf_counter()
+        linked_list = LinkedList()
+        for numbers in read_number_chunks(io.StringIO(text)):
+            linked_list.extend(numbers)
+        ingest = time.perf_counter() - start
+        start = time.perf_counter()
+        linked_list.write(io.StringIO())
+        results[("bulk", size)] = {"ingest": ingest,
+                                   "print": time.perf_counter() - start}
+        for path in ("token", "bulk"):
+            print("{:>6} {:>9}  ingest {:.4f}s  print {:.4f}s".format(
+                path, size, results[(path, size)]["ingest"],
+                results[(path, size)]["print"]))
+    return results
+
+# The most runs external_sort() merges at once
+MERGE_FAN_IN = 64
+
+def _write_run(values, path):
+    """
+    Spills sorted values to a run file, one value per line.
+
+    Args:
+        values (iterable): The integers to write, in descending order.
+        path (str): The run file to create.
+    """
+    with open(path, "w") as run_file:
+        values = iter(values)
+        while True:
+            lines = [str(value) for value in islice(values, 4096)]
+            if not lines:
+                break
+            run_file.write("\n".join(lines) + "\n")
+
+def _read_run(path):
+    with open(path) as run_file:
+        for line in run_file:
+            yield int(line)
+
+def external_sort(infile, outfile, run_size=1000000, strategy="merge",
+                  fan_in=MERGE_FAN_IN):
+    """
+    Sorts a file of integers that may not fit in memory. The input is read
+    in runs of at most run_size values; each run is loaded into a
+    LinkedList, sorted and spilled to a temporary file. The runs are then
+    merged fan_in at a time with a k-way heap merge, into intermediate run
+    files while more than fan_in are left, and the last merge streams the
+    descending result to outfile in the same "List[ v; v; ]" format that
+    printing a LinkedList produces.
+
+    At most fan_in run files are open at once, so peak memory is bounded by
+    run_size nodes plus fan_in buffered run files, however large the input
+    is.
+
+    Args:
+        infile (file): An open text file of whitespace separated integers.
+        outfile (file): An open text file the sorted list is written to.
+        run_size (int): The largest number of values held in memory at once.
+        strategy (str): The LinkedList sort strategy used for each run.
+        fan_in (int): The largest number of runs merged at once.
+
+    Raises:
+        ValueError: If run_size is smaller than 1 or fan_in smaller than 2.
+    """
+    if run_size < 1:
+        raise ValueError("run_size must be at least 1")
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2")
+    with tempfile.TemporaryDirectory() as run_dir:
+        run_paths = []
+        spilled = 0
+
+        def spill(values):
+            nonlocal spilled
+            path = os.path.join(run_dir, "run{}".format(spilled))
+            spilled += 1
+            _write_run(values, path)
+            run_paths.append(path)
+
+        linked_list = LinkedList()
+        count = 0
+        for value in read_numbers(infile):
+            linked_list.add(Node(value))
+            count += 1
+            if count == run_size:
+                linked_list.sort(strategy)
+                spill(linked_list.values())
+                linked_list = LinkedList()
+                count = 0
+        if count:
+            linked_list.sort(strategy)
+            spill(linked_list.values())
+        linked_list = None
+
+        # Merge the oldest runs first so every value is merged about
+        # log(runs) / log(fan_in) times
+        while len(run_paths) > fan_in:
+            group, run_paths[:fan_in] = run_paths[:fan_in], []
+            spill(heapq.merge(*map(_read_run, group), reverse=True))
+            for path in group:
+                os.remove(path)
+
+        write_list(heapq.merge(*map(_read_run, run_paths), reverse=True),
+                   outfile)
+        outfile.write('\n')
+
+def _sort_chunk(chunk, strategy, backend):
+    """
+    Sorts one chunk of values in a worker process.
+
+    Args:
+        chunk (list): The integers to sort.
+        strategy (str): The sort strategy to use.
+        backend (str): The list class to sort with, a key of BACKENDS.
+
+    Returns:
+        list: The values in descending order.
+    """
+    linked_list = BACKENDS[backend]()
+    linked_list.extend(chunk)
+    linked_list.sort(strategy)
+    return list(linked_list.values())
+
+def parallel_sort(values, workers=None, strategy="merge", backend="node"):
+    """
+    Sorts a list of integers into a descending linked list using a pool of
+    processes. The values are split into one contiguous chunk per worker,
+    each chunk is sorted in its own process, and the sorted chunks are
+    merged on this process and streamed into the tail of the result in a
+    single pass.
+    The result holds the same sequence as a serial sort of the values.
+
+    Args:
+        values (list): The integers to sort.
+        workers (int): The number of processes, os.cpu_count() by default.
+        strategy (str): The sort strategy each worker uses.
+        backend (str): The list class to build, one of the keys of BACKENDS.
+
+    Raises:
+        ValueError: If workers is smaller than 1.
+
+    Returns:
+        The sorted list, an instance of BACKENDS[backend].
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if strategy not in SORT_STRATEGIES:
+        raise ValueError("Unknown sort strategy: {}".format(strategy))
+    linked_list = BACKENDS[backend]()
+    if not values:
+        return linked_list
+
+    size = -(-len(values) // workers)  # Ceiling division
+    chunks = [values[i:i + size] for i in range(0, len(values), size)]
+    if len(chunks) == 1:
+        runs = [_sort_chunk(chunks[0], strategy, backend)]
+    else:
+        with ProcessPoolExecutor(len(chunks)) as pool:
+            runs = list(pool.map(_sort_chunk, chunks,
+                                 [strategy] * len(chunks),
+                                 [backend] * len(chunks)))
+    _link_in_order(linked_list, heapq.merge(*runs, reverse=True))
+    return linked_list
+
+def _link_in_order(linked_list, values):
+    """
+    Builds an empty list from values in a single pass, appending each value
+    at the tail so the list holds them in the order given. No intermediate
+    list of the values is made.
+
+    Args:
+        linked_list (LinkedList or ArrayLinkedList): An empty list.
+        values (iterable): The integers, in the order the list should hold.
+    """
+    if isinstance(linked_list, ArrayLinkedList):
+        linked_list._values.extend(values)
+        size = len(linked_list._values)
+        if size:
+            # Slot i links to slot i + 1 and the last slot ends the list
+            linked_list._links.extend(range(1, size))
+            linked_list._links.append(NIL)
+            linked_list._head = 0
+        return
+    tail = None
+    for value in values:
+        node = Node(value)
+        if tail is None:
+            linked_list._head = node
+        else:
+            tail._next = node
+        tail = node
+
+def benchmark_parallel(size=400000, worker_counts=(1, 2, 4), seed=120):
+    """
+    Times parallel_sort() with different numbers of worker processes on the
+    same random values and prints the speedup over a single worker.
+
+    Args:
+        size (int): How many integers to sort.
+        worker_counts (tuple): The worker counts to time.
+        seed (int): The seed for the random values so runs are repeatable.
+
+    Returns:
+        results (dict): Maps each worker count to the time in seconds.
+    """
+    rng = random.Random(seed)
+    values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(size)]
+    results = {}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        parallel_sort(values, workers)
+        results[workers] = time.perf_counter() - start
+        print("{:>3} workers {:>9} {:.4f}s  speedup {:.2f}x".format(
+            workers, size, results[workers],
+            results[worker_counts[0]] / results[workers]))
+    return results
+
+def main(strategy="merge", run_size=None, backend="node", workers=None):
+    """
+    Reads a file name from the user, sorts the integers in that file in
+    descending order and prints the sorted list.
+
+    Args:
+        strategy (str): The LinkedList sort strategy to use.
+        run_size (int): If given, sort with external_sort() holding at most
+        this many values in memory at once instead of loading the whole file.
+        backend (str): The list class to load the file into, one of the keys
+        of BACKENDS.
+        workers (int): If given, sort with parallel_sort() using this many
+        processes.
+    """
     filename = input()
-    
-    infile = open(filename, "r")
-    for line in infile:
-        # Process each line and add numbers as nodes to the linked list
-        numbers = line.strip().split()
-        for num in numbers:
-            node = Node(int(num))
-            linked_list.add(node)
-    
-    # Sort the linked list in descending order
-    linked_list.sort()
-    # Print the sorted list
-    print(linked_list)
-        
-main()
\ No newline at end of file
+    if run_size is not None:
+        with open(filename, "r") as infile:
+            external_sort(infile, sys.stdout, run_size, strategy)
+        return
+
+    try:
+        if workers is not None:
+            with open(filename, "r") as infile:
+                values = []
+                for numbers in read_number_chunks(infile):
+                    values.extend(numbers)
+            linked_list = parallel_sort(values, workers, strategy, backend)
+        else:
+            # Read the numbers a buffer at a time straight into the list
+            linked_list = BACKENDS[backend]()
+            with open(filename, "r") as infile:
+                for numbers in read_number_chunks(infile):
+                    linked_list.extend(numbers)
+            
+            # Sort the linked list in descending order
+            linked_list.sort(strategy)
+    except OverflowError:
+        # Only the array backend limits the size of the values
+        sys.exit("The {} backend only holds 64 bit integers; use "
+                 "--backend node for larger values".format(backend))
+    # Stream the sorted list instead of building one large string
+    linked_list.write(sys.stdout)
+    sys.stdout.write('\n')
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sort a file of integers in descending order. The file "
+                    "name is read from standard input.")
+    parser.add_argument("--strategy", choices=sorted(SORT_STRATEGIES),
+                        default="merge", help="the linked list sort to use")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        default="node", help="the linked list class to use")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="sort in parallel with this many processes")
+    parser.add_argument("--run-size", type=int, default=None,
+                        help="sort externally, holding at most this many "
+                             "values in memory at once")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.strategy, args.run_size, args.backend, args.workers)
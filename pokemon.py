@@ -7,7 +7,43 @@ statistics and organizes the information into a 2-level dictionary. This
 poke_dict is used to compute maximum averages for a given statistic like speed, 
 hp, etc. A user can enter a stat and this program with return the type of 
 Pokemon with that max average for that stat and then the numerical value. 
+Other queries such as "median speed by generation" or "top 3 hp" are
+answered by QueryEngine. The parsed csv file is cached in a binary columnar
+file next to it, which later runs memory-map instead of parsing. Lines
+starting with add, update or remove change the roster between queries. 
+The per-type stat aggregates are computed once, so each query is a lookup. 
+StatsMatrix is an optional NumPy backend that computes the same answers with
+vectorized reductions. 
 '''
+import argparse
+import heapq
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+# NumPy is only needed for the StatsMatrix backend, so it is imported on
+# first use to keep startup fast
+np = None
+
+def _require_numpy():
+    """Imports NumPy into the module namespace the first time it is needed.
+
+    Raises:
+        ImportError: If NumPy is not installed. 
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("StatsMatrix requires NumPy") from None
+        np = numpy
+
 def process_input(filename):
     """This function processes a given csv file by stripping each line and
     splitting on the comma and appends each processed line as a subslist to 
@@ -57,6 +93,333 @@ def make_dict(poke_list):
 
     return poke_dict
 
+# Maps each stat name to its column in the stats list of a Pokemon
+POKE_STAT_INDICES = {
+    'total': 0,
+    'hp': 1,
+    'attack': 2,
+    'defense': 3,
+    'specialattack': 4,
+    'specialdefense': 5,
+    'speed': 6
+}
+
+def _stat_values(stats):
+    """Returns the seven stats of a Pokemon as integers.
+
+    Raises:
+        ValueError: If a stat is missing or not an integer. 
+    """
+    if len(stats) < len(POKE_STAT_INDICES):
+        raise ValueError("A Pokemon needs {} stats".format(
+            len(POKE_STAT_INDICES)))
+    return [int(stats[index]) for index in range(len(POKE_STAT_INDICES))]
+
+class TypeAggregates:
+    """This class holds per-type aggregates of the Pokemon stats, built once
+    from the 2D Pokemon dictionary so that queries do not rescan it. 
+
+    For each type it stores the sum of every stat and the number of Pokemon.
+    For each stat a heap orders the types by their average, so the max
+    average and its tied types are found without scanning every type, and
+    add() and discard() keep everything up to date in O(log T) for T types.
+    Ties are broken by the order the types were first added, which is the
+    order of poke_dict, so the answers match a full recomputation. 
+    """
+    def __init__(self, poke_dict):
+        """Sums every stat for each type of Pokemon, converting each stat to
+        an int only once, and then orders the types for every stat.
+
+        Args:
+            poke_dict (dict): A 2D Pokemon dictionary. 
+        """
+        self._sums = {}
+        self._counts = {}
+        for poke_type, pokemons in poke_dict.items():
+            sums = [0] * len(POKE_STAT_INDICES)
+            for stats in pokemons.values():
+                for index in range(len(sums)):
+                    sums[index] += int(stats[index])
+            self._sums[poke_type] = sums
+            self._counts[poke_type] = len(pokemons)
+        self._refresh()
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Builds the aggregates from a PokeColumns table, whose stats are
+        already integers, instead of from the 2D Pokemon dictionary.
+
+        Args:
+            columns (PokeColumns): The parsed Pokemon columns.
+
+        Returns:
+            TypeAggregates: The same aggregates as building from the 2D
+            Pokemon dictionary the columns were made from.
+        """
+        aggregates = cls.__new__(cls)
+        width = len(POKE_STAT_INDICES)
+        sums_list = [[0] * width for _ in columns.types]
+        counts = [0] * len(columns.types)
+        stats = columns.stats
+        base = 0
+        for code in columns.codes:
+            sums = sums_list[code]
+            for index in range(width):
+                sums[index] += stats[base + index]
+            counts[code] += 1
+            base += width
+        aggregates._sums = dict(zip(columns.types, sums_list))
+        aggregates._counts = dict(zip(columns.types, counts))
+        aggregates._refresh()
+        return aggregates
+
+    def _refresh(self):
+        """Rebuilds the heap of types for every stat from the sums and
+        counts. A heap entry is (-average, order, version, type); it is stale
+        once the type's version has moved on, and stale entries are dropped
+        when they reach the top. Versions come from one counter for all
+        types, so a type that is removed and added again never revives its
+        old entries.
+        """
+        self._order = {poke_type: order for order, poke_type
+                       in enumerate(self._sums)}
+        self._next_order = len(self._order)
+        self._versions = {poke_type: 0 for poke_type in self._sums}
+        self._next_version = 1
+        self._heaps = [[] for _ in POKE_STAT_INDICES]
+        for poke_type in self._sums:
+            self._push(poke_type)
+        for heap in self._heaps:
+            heapq.heapify(heap)
+        self._answers = {}
+
+    def _push(self, poke_type):
+        """Adds fresh heap entries for a type whose sums have changed."""
+        count = self._counts[poke_type]
+        order = self._order[poke_type]
+        version = self._versions[poke_type]
+        for index, sums_value in enumerate(self._sums[poke_type]):
+            heapq.heappush(self._heaps[index],
+                           (-(sums_value / count), order, version, poke_type))
+
+    def _top(self, index):
+        """Returns the live top entry of a stat's heap, or None."""
+        heap = self._heaps[index]
+        while heap and heap[0][2] != self._versions.get(heap[0][3]):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def add(self, poke_type, stats):
+        """Adds the stats of one Pokemon to its type. Nothing changes if a
+        stat is not an integer.
+
+        Args:
+            poke_type (str): The type of the Pokemon.
+            stats (list): The stats of the Pokemon, as in poke_dict.
+
+        Raises:
+            ValueError: If a stat is not an integer. 
+        """
+        values = _stat_values(stats)
+        if poke_type not in self._sums:
+            self._sums[poke_type] = [0] * len(POKE_STAT_INDICES)
+            self._counts[poke_type] = 0
+            self._order[poke_type] = self._next_order
+            self._next_order += 1
+        sums = self._sums[poke_type]
+        for index, value in enumerate(values):
+            sums[index] += value
+        self._counts[poke_type] += 1
+        self._changed(poke_type)
+
+    def discard(self, poke_type, stats):
+        """Removes the stats of one Pokemon from its type. The type is
+        dropped once it has no Pokemon left. Nothing changes if a stat is
+        not an integer.
+
+        Args:
+            poke_type (str): The type of the Pokemon.
+            stats (list): The stats of the Pokemon, as in poke_dict.
+
+        Raises:
+            ValueError: If a stat is not an integer. 
+        """
+        values = _stat_values(stats)
+        sums = self._sums[poke_type]
+        for index, value in enumerate(values):
+            sums[index] -= value
+        self._counts[poke_type] -= 1
+        if self._counts[poke_type] == 0:
+            del self._sums[poke_type]
+            del self._counts[poke_type]
+            del self._order[poke_type]
+            del self._versions[poke_type]
+            self._answers = {}
+        else:
+            self._changed(poke_type)
+
+    def _changed(self, poke_type):
+        self._versions[poke_type] = self._next_version
+        self._next_version += 1
+        self._push(poke_type)
+        self._answers = {}
+        # Drop stale entries once they outnumber the live ones
+        if len(self._heaps[0]) > 4 * len(self._sums) + 16:
+            self._compact()
+
+    def _compact(self):
+        for index, heap in enumerate(self._heaps):
+            self._heaps[index] = [entry for entry in heap if
+                                  entry[2] == self._versions.get(entry[3])]
+            heapq.heapify(self._heaps[index])
+
+    def max_averages(self):
+        """Returns a dictionary that stores the type reaching the max average
+        and the max average as a tuple value with the stat as its key pair. 
+        """
+        max_averages = {}
+        for stat, index in POKE_STAT_INDICES.items():
+            top = self._top(index)
+            max_averages[stat] = (None, None) if top is None \
+            else (top[3], -top[0])
+        return max_averages
+
+    def answer(self, stat):
+        """Returns the formatted types and averages tied for the max average
+        of a stat, or an empty string if the stat is unknown.
+        """
+        if stat not in POKE_STAT_INDICES:
+            return ""
+        if stat not in self._answers:
+            # Pop the types tied at the top of the heap, then put them back
+            heap = self._heaps[POKE_STAT_INDICES[stat]]
+            tied = []
+            top = self._top(POKE_STAT_INDICES[stat])
+            while top is not None and (not tied or top[0] == tied[0][0]):
+                tied.append(heapq.heappop(heap))
+                top = self._top(POKE_STAT_INDICES[stat])
+            for entry in tied:
+                heapq.heappush(heap, entry)
+            results = sorted((entry[3], -entry[0]) for entry in tied)
+            self._answers[stat] = "\n".join(f"{pokemon_type}: {average}" \
+            for pokemon_type, average in results)
+        return self._answers[stat]
+
+class StatsMatrix:
+    """This class is a NumPy backend for the same queries as TypeAggregates.
+    It stores the stats of every Pokemon in an integer matrix with one row
+    per Pokemon and one column per stat, plus an integer type code for each
+    row. 
+
+    The per-type means of all stats come from one group-by reduction, and
+    the max average types from an argmax over the means with an exact
+    equality test for ties, so the answers are identical to TypeAggregates.
+    """
+    def __init__(self, poke_dict):
+        """Builds the stats matrix and type codes from the 2D Pokemon
+        dictionary and precomputes the answer for every stat. 
+
+        Args:
+            poke_dict (dict): A 2D Pokemon dictionary. 
+
+        Raises:
+            ImportError: If NumPy is not installed. 
+        """
+        _require_numpy()
+        num_stats = len(POKE_STAT_INDICES)
+        # Type codes follow the order of poke_dict, which is the order the
+        # types first appear in the csv file
+        self._types = list(poke_dict)
+        counts = [len(pokemons) for pokemons in poke_dict.values()]
+        self._codes = np.repeat(np.arange(len(self._types)), counts)
+        # Parse every stat in a single pass over one comma separated string
+        text = ",".join([",".join(stats[:num_stats])
+                         for pokemons in poke_dict.values()
+                         for stats in pokemons.values()])
+        self._stats = np.fromstring(text, dtype=np.int64, sep=",") \
+        if text else np.zeros(0, dtype=np.int64)
+        if len(self._stats) != sum(counts) * num_stats:
+            raise ValueError("Every Pokemon needs {} integer stats".format(
+                num_stats))
+        self._stats = self._stats.reshape(-1, num_stats)
+        self._group()
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Builds the matrix directly on the typed arrays of a PokeColumns
+        table, without copying them when they are memory-mapped.
+
+        Args:
+            columns (PokeColumns): The parsed Pokemon columns.
+
+        Raises:
+            ImportError: If NumPy is not installed. 
+
+        Returns:
+            StatsMatrix: The same matrix as building from the 2D Pokemon
+            dictionary the columns were made from.
+        """
+        _require_numpy()
+        matrix = cls.__new__(cls)
+        matrix._types = list(columns.types)
+        matrix._codes = np.frombuffer(columns.codes, dtype=np.intc)
+        # Cached stats may be narrower than the sums need
+        matrix._stats = np.asarray(columns.stats) \
+        .astype(np.int64, copy=False).reshape(-1, len(POKE_STAT_INDICES))
+        matrix._group()
+        return matrix
+
+    def _group(self):
+        """Sums each stat column per type code in one group-by reduction and
+        then precomputes the answer for every stat.
+        """
+        self._sums = np.zeros((len(self._types), len(POKE_STAT_INDICES)),
+                              dtype=np.int64)
+        np.add.at(self._sums, self._codes, self._stats)
+        self._counts = np.bincount(self._codes, minlength=len(self._types))
+        self._refresh()
+
+    def _refresh(self):
+        """Recomputes the max average, the first type reaching it and the
+        formatted answer for every stat from the sums and counts.
+        """
+        self._max_averages = {}
+        self._answers = {}
+        if len(self._types) == 0:
+            for stat in POKE_STAT_INDICES:
+                self._max_averages[stat] = (None, None)
+                self._answers[stat] = ""
+            return
+        means = self._sums / self._counts[:, np.newaxis]
+        # argmax returns the first type with the max, like a strict > scan
+        leaders = np.argmax(means, axis=0)
+        for stat, index in POKE_STAT_INDICES.items():
+            max_value = float(means[leaders[index], index])
+            self._max_averages[stat] = (self._types[leaders[index]],
+                                        max_value)
+            tied = np.flatnonzero(means[:, index] == max_value)
+            results = sorted((self._types[code], max_value) for code in tied)
+            self._answers[stat] = "\n".join(f"{pokemon_type}: {average}" \
+            for pokemon_type, average in results)
+
+    def max_averages(self):
+        """Returns a dictionary that stores the type reaching the max average
+        and the max average as a tuple value with the stat as its key pair. 
+        """
+        return dict(self._max_averages)
+
+    def answer(self, stat):
+        """Returns the formatted types and averages tied for the max average
+        of a stat, or an empty string if the stat is unknown.
+        """
+        return self._answers.get(stat, "")
+
+# Maps each backend name to the class that aggregates the stats
+BACKENDS = {
+    'dict': TypeAggregates,
+    'numpy': StatsMatrix
+}
+
 def compute_max_averages(poke_dict):
     """Computes the max averages for each stat for each type of Pokemon in the
     2D pokemon dictionary.
@@ -68,48 +431,21 @@ def compute_max_averages(poke_dict):
         max_averages: A dictionary that stores max average and pokemon type as
         a tuple value with the stat as its key pair.
     """
-    poke_stat_indices = {
-            'total': 0,
-            'hp': 1,
-            'attack': 2,
-            'defense': 3,
-            'specialattack': 4,
-            'specialdefense': 5,
-            'speed': 6
-        }
-    # Creates a dictionary that stores the max average and corresponding 
-    # Pokemon type with that stat
-    max_averages = {stat: (None, None) for stat in poke_stat_indices}
-        
-    for poke_type, pokemons in poke_dict.items():
-        # Accumulates the stat totals 
-        totals = {stat: 0 for stat in poke_stat_indices}
-        # Tracks how man Pokemon contribute to the stat totals for averaging
-        counts = {stat: 0 for stat in poke_stat_indices}
-        
-        for stats in pokemons.values():
-            for stat, index in poke_stat_indices.items():
-                value = int(stats[index])
-                totals[stat] += value
-                counts[stat] += 1
-        
-        for stat in poke_stat_indices:
-            # If the count is not empty for that stat => Compute average
-            if counts[stat] > 0:
-                average = totals[stat] / counts[stat]
-                if max_averages[stat][0] is None or \
-                average > max_averages[stat][1]:
-                    max_averages[stat] = (poke_type, average)
-    
-    return max_averages
+    return TypeAggregates(poke_dict).max_averages()
     
-def print_max_averages(query, poke_dict):
+def print_max_averages(query, poke_dict, aggregates=None, backend='dict'):
     """Helps format the max average information and process user queries to
     return desired statistics for each Pokemon type. 
 
     Args:
         query (str): Users given silent prompt for any stat they want.
         poke_dict (dict): A 2D Pokemon dictionary. 
+        aggregates (TypeAggregates or StatsMatrix): The precomputed 
+        aggregates of poke_dict.
+        They are built from poke_dict when not given, so pass them in when
+        answering more than one query. 
+        backend (str): The aggregates to build when they are not given, one
+        of the keys of BACKENDS.
 
     Returns:
         str: A formatted string representation of the Pokemon type and 
@@ -118,55 +454,675 @@ def print_max_averages(query, poke_dict):
     # Ensures user queries are case-insensitive
     query = query.strip().lower()
     
-    poke_stat_indices = {
-        'total': 0,
-        'hp': 1,
-        'attack': 2,
-        'defense': 3,
-        'specialattack': 4,
-        'specialdefense': 5,
-        'speed': 6
-    }
-    
-    if query not in poke_stat_indices:
+    if query not in POKE_STAT_INDICES:
         return ""
-    # Retrieve the pre-computed max averages
-    max_averages = compute_max_averages(poke_dict)
-    max_value = max_averages[query][1]
+    if aggregates is None:
+        aggregates = BACKENDS[backend](poke_dict)
+    # Retrieve the pre-computed answer
+    return aggregates.answer(query)
     
-    results = []
-    for type_key, pokemons in poke_dict.items():
-        totals = 0
-        counts = 0
+def add_pokemon(poke_dict, aggregates, pokemon):
+    """Adds a new Pokemon to the 2D Pokemon dictionary and its aggregates.
+
+    Args:
+        poke_dict (dict): A 2D Pokemon dictionary. 
+        aggregates (TypeAggregates): The live aggregates of poke_dict.
+        pokemon (list): One split csv line, as returned by process_input.
+
+    Raises:
+        ValueError: If a Pokemon with that name and type already exists. 
+    """
+    poke_name, poke_type, poke_stats = pokemon[1], pokemon[2], pokemon[4:]
+    if poke_name in poke_dict.get(poke_type, {}):
+        raise ValueError("{} is already a {} Pokemon".format(poke_name,
+                                                             poke_type))
+    aggregates.add(poke_type, poke_stats)
+    poke_dict.setdefault(poke_type, {})[poke_name] = poke_stats
+
+def update_pokemon(poke_dict, aggregates, pokemon):
+    """Replaces the stats of an existing Pokemon in the 2D Pokemon dictionary
+    and its aggregates.
+
+    Args:
+        poke_dict (dict): A 2D Pokemon dictionary. 
+        aggregates (TypeAggregates): The live aggregates of poke_dict.
+        pokemon (list): One split csv line, as returned by process_input.
+
+    Raises:
+        KeyError: If there is no Pokemon with that name and type. 
+    """
+    poke_name, poke_type, poke_stats = pokemon[1], pokemon[2], pokemon[4:]
+    old_stats = poke_dict.get(poke_type, {})[poke_name]
+    # Add before discarding so the type never empties and keeps its order
+    aggregates.add(poke_type, poke_stats)
+    aggregates.discard(poke_type, old_stats)
+    poke_dict[poke_type][poke_name] = poke_stats
+
+def remove_pokemon(poke_dict, aggregates, poke_name, poke_type):
+    """Removes a Pokemon from the 2D Pokemon dictionary and its aggregates.
+    A type with no Pokemon left is removed as well. 
+
+    Args:
+        poke_dict (dict): A 2D Pokemon dictionary. 
+        aggregates (TypeAggregates): The live aggregates of poke_dict.
+        poke_name (str): The name of the Pokemon.
+        poke_type (str): The type of the Pokemon.
+
+    Raises:
+        KeyError: If there is no Pokemon with that name and type. 
+    """
+    poke_stats = poke_dict.get(poke_type, {})[poke_name]
+    aggregates.discard(poke_type, poke_stats)
+    del poke_dict[poke_type][poke_name]
+    if not poke_dict[poke_type]:
+        del poke_dict[poke_type]
+
+def apply_update(line, poke_dict, aggregates):
+    """Applies an update line from the query stream. The forms are
+
+        add <csv line>
+        update <csv line>
+        remove <name>,<type>
+
+    where <csv line> is a whole line in the format of the input csv file,
+    through the generation and legendary columns.
+
+    Args:
+        line (str): The update line.
+        poke_dict (dict): A 2D Pokemon dictionary. 
+        aggregates (TypeAggregates): The live aggregates of poke_dict.
+
+    Raises:
+        ValueError: If the line is not a valid update. 
+        KeyError: If the Pokemon to update or remove does not exist. 
+    """
+    command, _, rest = line.strip().partition(" ")
+    fields = rest.strip().split(",")
+    command = command.lower()
+    # A csv line has four fields before the stats list, which runs through
+    # the last column a query can group by
+    width = 4 + max(index for index in GROUP_COLUMNS.values()
+                    if index is not None) + 1
+    if command in ('add', 'update') and len(fields) >= width:
+        if command == 'add':
+            add_pokemon(poke_dict, aggregates, fields)
+        else:
+            update_pokemon(poke_dict, aggregates, fields)
+    elif command == 'remove' and len(fields) == 2:
+        remove_pokemon(poke_dict, aggregates, fields[0], fields[1])
+    else:
+        raise ValueError("Not a valid update: " + line.strip())
+
+# The first word of a query line that changes the roster
+UPDATE_COMMANDS = ('add', 'update', 'remove')
+
+class PokeColumns:
+    """This class stores the parsed Pokemon data column by column: a typed
+    array of the seven integer stats of every Pokemon, a type dictionary with
+    an integer type code per Pokemon, and tables of the names and of the
+    remaining csv fields such as generation. 
+
+    It can be saved to a compact binary cache file and loaded back with
+    mmap, so a later run reads the typed arrays straight from the page cache
+    instead of parsing the csv file again. 
+    """
+    # magic, csv mtime (ns), csv size, rows, types, the byte size of one
+    # cached stat, and the byte lengths of the type, name and extra field
+    # tables
+    HEADER = struct.Struct("<8sqqqqqqqq")
+    MAGIC = b"POKECO3" + (b"L" if sys.byteorder == "little" else b"B")
+    # The cache stores the stats in the first of these that holds them all
+    STAT_TYPECODES = ("h", "i", "q")
+
+    def __init__(self, types, codes, stats, names, extras, poke_dict=None):
+        """
+        Args:
+            types (list): The type names; a type code indexes this list.
+            codes (array): The type code of every Pokemon, C ints.
+            stats (array): The seven stats of every Pokemon, row by row, as
+            ints. They are 64 bit when parsed and may be narrower when
+            loaded from a cache file.
+            names (list): The name of every Pokemon.
+            extras (list): The csv fields after the seven stats of every
+            Pokemon, each preceded by a comma, so an empty string means no
+            fields and "," one empty field.
+            poke_dict (dict): The 2D Pokemon dictionary the columns were made
+            from, if there is one. 
+        """
+        self.types = types
+        self.codes = codes
+        self.stats = stats
+        self._names = names
+        self._extras = extras
+        self._poke_dict = poke_dict
+
+    @classmethod
+    def from_dict(cls, poke_dict):
+        """Converts the 2D Pokemon dictionary into columns.
+
+        Args:
+            poke_dict (dict): A 2D Pokemon dictionary. 
+
+        Returns:
+            PokeColumns: The columns, in the order of poke_dict. 
+        """
+        width = len(POKE_STAT_INDICES)
+        codes = array("i")
+        stats = array("q")
+        names = []
+        extras = []
+        for code, pokemons in enumerate(poke_dict.values()):
+            for name, poke_stats in pokemons.items():
+                codes.append(code)
+                stats.extend([int(stat) for stat in poke_stats[:width]])
+                names.append(name)
+                extras.append("".join("," + field
+                                      for field in poke_stats[width:]))
+        return cls(list(poke_dict), codes, stats, names, extras, poke_dict)
+
+    def to_dict(self):
+        """Returns the 2D Pokemon dictionary the columns hold, rebuilding it
+        from the columns if the columns were loaded from a cache file. 
+        """
+        if self._poke_dict is None:
+            width = len(POKE_STAT_INDICES)
+            names = self._names()
+            extras = self._extras()
+            poke_dict = {}
+            for row, code in enumerate(self.codes):
+                poke_stats = [str(stat) for stat in
+                              self.stats[row * width:(row + 1) * width]]
+                # Drop the empty string before the first comma
+                poke_stats += extras[row].split(",")[1:]
+                poke_dict.setdefault(self.types[code], {})[names[row]] = \
+                poke_stats
+            self._poke_dict = poke_dict
+        return self._poke_dict
+
+    def save(self, path, key):
+        """Writes the columns to a binary cache file. The file is written
+        under a temporary name and then renamed, so a reader never sees a
+        partly written cache. 
+
+        Args:
+            path (str): The cache file name.
+            key (tuple): The (mtime in ns, size) of the csv file the columns
+            were parsed from.
+        """
+        names = self._names() if callable(self._names) else self._names
+        extras = self._extras() if callable(self._extras) else self._extras
+        tables = ["\n".join(table).encode()
+                  for table in (self.types, names, extras)]
+        stats = _narrow_stats(self.stats, self.STAT_TYPECODES)
+        header = self.HEADER.pack(self.MAGIC, key[0], key[1], len(self.codes),
+                                  len(self.types), stats.itemsize,
+                                  *map(len, tables))
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as outfile:
+                outfile.write(header)
+                # Widest items first so both arrays stay aligned
+                for section in sorted((stats, self.codes), reverse=True,
+                                      key=lambda section: section.itemsize):
+                    outfile.write(section)
+                for table in tables:
+                    outfile.write(table)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, key):
+        """Memory-maps a binary cache file written by save().
+
+        Args:
+            path (str): The cache file name.
+            key (tuple): The (mtime in ns, size) the csv file has now.
+
+        Returns:
+            PokeColumns: The columns, or None if the file is missing, not a
+            cache file, or was written for a different version of the csv.
+        """
+        try:
+            with open(path, "rb") as infile:
+                buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # ValueError for an empty file
+            return None
+        if len(buffer) < cls.HEADER.size:
+            return None
+        magic, mtime, size, rows, num_types, stat_size, *lengths = \
+        cls.HEADER.unpack_from(buffer)
+        stat_codes = {array(code).itemsize: code
+                      for code in cls.STAT_TYPECODES}
+        if magic != cls.MAGIC or (mtime, size) != tuple(key) or \
+        stat_size not in stat_codes:
+            return None
+        
+        # The arrays follow the header widest first, as save() wrote them
+        sections = sorted((("stats", stat_codes[stat_size],
+                            len(POKE_STAT_INDICES) * rows),
+                           ("codes", "i", rows)),
+                          key=lambda section: array(section[1]).itemsize,
+                          reverse=True)
+        view = memoryview(buffer)
+        offset = cls.HEADER.size
+        arrays = {}
+        for name, code, count in sections:
+            end = offset + count * array(code).itemsize
+            if end > len(buffer):
+                return None
+            arrays[name] = view[offset:end].cast(code)
+            offset = end
+        if len(buffer) != offset + sum(lengths):
+            return None
+        stats, codes = arrays["stats"], arrays["codes"]
+        table_ends = [offset + sum(lengths[:i + 1]) for i in range(3)]
+        tables = [view[start:end] for start, end in
+                  zip([offset] + table_ends, table_ends)]
+        types = _split_table(tables[0], num_types)
+        # The name and extra field tables are only decoded when needed
+        names = lambda: _split_table(tables[1], rows)
+        extras = lambda: _split_table(tables[2], rows)
+        return cls(types, codes, stats, names, extras)
+
+def _narrow_stats(stats, typecodes):
+    """Returns the stats as an array of the first typecode in typecodes
+    that can hold every one of them, checking each in turn. 
+    """
+    for code in typecodes[:-1]:
+        try:
+            return array(code, stats)
+        except OverflowError:
+            pass
+    return array(typecodes[-1], stats)
+
+def _split_table(view, count):
+    """Decodes a newline separated string table holding count strings."""
+    if count == 0:
+        return []
+    return bytes(view).decode().split("\n")
+
+def load_columns(filename, use_cache=True):
+    """Loads the Pokemon csv file as PokeColumns. When use_cache is set, a
+    binary cache file next to the csv file is memory-mapped if it was made
+    from the csv file's current mtime and size; otherwise the csv file is
+    parsed with process_input and make_dict and the cache is rewritten. 
+
+    Args:
+        filename (.csv file): A csv file containing information about various
+        Pokemon with their name, stats, generation, etc. 
+        use_cache (bool): Whether to read and write the cache file.
+
+    Returns:
+        columns (PokeColumns): The parsed Pokemon columns.
+    """
+    status = os.stat(filename)
+    key = (status.st_mtime_ns, status.st_size)
+    path = cache_path(filename)
+    if use_cache:
+        columns = PokeColumns.load(path, key)
+        if columns is not None:
+            return columns
+    columns = PokeColumns.from_dict(make_dict(process_input(filename)))
+    if use_cache:
+        try:
+            columns.save(path, key)
+        except OSError:
+            pass  # The cache is only an optimization
+    return columns
+
+def cache_path(filename):
+    """Returns the name of the binary cache file for a csv file."""
+    return filename + ".pokecache"
+
+# Maps each column a query can group by to its index in the stats list of a
+# Pokemon, None meaning the type the Pokemon is filed under in poke_dict
+GROUP_COLUMNS = {
+    'type': None,
+    'generation': 7,
+    'legendary': 8
+}
+
+class QueryEngine:
+    """This class answers aggregation queries over the 2D Pokemon dictionary.
+    A query has one of the forms
+
+        <aggregate> <stat> [by <column>]
+        top <k> <stat> [by <column>]
+
+    where aggregate is min, max, mean, median or pN for the Nth percentile
+    (0 <= N <= 100), stat is a key of POKE_STAT_INDICES and column is a key
+    of GROUP_COLUMNS, type by default. Aggregate queries give one line per
+    group, sorted by group, numerically for numeric groups. top k ranks the
+    groups by their mean of the stat, highest first, and gives the first k. 
+
+    The values of each stat are kept sorted per group, built the first time
+    a (column, stat) pair is queried, so order statistics are lookups into
+    a sorted list. Answers are cached by the normalized query. 
+    """
+    def __init__(self, poke_dict):
+        """Stores the rows of the 2D Pokemon dictionary for later grouping.
+
+        Args:
+            poke_dict (dict): A 2D Pokemon dictionary. 
+        """
+        self._rows = [(poke_type, stats) for poke_type, pokemons in
+                      poke_dict.items() for stats in pokemons.values()]
+        self._columns = {}
+        self._cache = {}
+
+    def _sorted_column(self, column, stat):
+        """Returns a dictionary mapping each group of column to the sorted
+        values of stat in that group, building it on first use. Rows that
+        do not have the column are left out. 
+        """
+        key = (column, stat)
+        if key not in self._columns:
+            group_index = GROUP_COLUMNS[column]
+            stat_index = POKE_STAT_INDICES[stat]
+            groups = {}
+            for poke_type, stats in self._rows:
+                if group_index is None:
+                    group = poke_type
+                elif group_index < len(stats):
+                    group = stats[group_index]
+                else:
+                    continue
+                groups.setdefault(group, []).append(int(stats[stat_index]))
+            for values in groups.values():
+                values.sort()
+            self._columns[key] = groups
+        return self._columns[key]
+
+    def run(self, query):
+        """Answers a query, from the cache when it was asked before.
+
+        Args:
+            query (str): A query in one of the forms described above. 
+
+        Returns:
+            str: One "group: value" line per group, or an empty string if
+            the query is not valid. 
+        """
+        words = query.strip().lower().split()
+        key = " ".join(words)
+        if key not in self._cache:
+            self._cache[key] = self._answer(words)
+        return self._cache[key]
+
+    def _answer(self, words):
+        column = 'type'
+        if len(words) >= 2 and words[-2] == 'by':
+            column = words[-1]
+            words = words[:-2]
+        if column not in GROUP_COLUMNS:
+            return ""
         
-        for stats in pokemons.values():
-            value = int(stats[poke_stat_indices[query]])
-            totals += value
-            counts += 1
+        if len(words) == 3 and words[0] == 'top' and words[1].isdecimal():
+            k, stat = int(words[1]), words[2]
+            if stat not in POKE_STAT_INDICES:
+                return ""
+            groups = self._sorted_column(column, stat)
+            means = [(group, sum(values) / len(values))
+                     for group, values in groups.items()]
+            means.sort(key=lambda item: (-item[1], _group_key(item[0])))
+            return "\n".join(f"{group}: {value}" for group, value
+                             in means[:k])
         
-        if counts > 0:
-            average = totals / counts
-            if average == max_value:
-                results.append((type_key, average))
-    
-    results.sort()
-    return "\n".join(f"{pokemon_type}: {average}" \
-    for pokemon_type, average in results)
-    
-def main():
+        if len(words) != 2 or words[1] not in POKE_STAT_INDICES:
+            return ""
+        aggregate, stat = words
+        groups = self._sorted_column(column, stat)
+        results = []
+        for group in sorted(groups, key=_group_key):
+            value = _aggregate(aggregate, groups[group])
+            if value is None:
+                return ""
+            results.append(f"{group}: {value}")
+        return "\n".join(results)
+
+def _group_key(group):
+    """Sorts numeric groups such as generations by their number, ahead of
+    any other groups, which sort as strings. 
+    """
+    try:
+        return (0, int(group), group)
+    except ValueError:
+        return (1, 0, group)
+
+def _aggregate(aggregate, values):
+    """Computes an aggregate of a non-empty ascending list of numbers.
+
+    Args:
+        aggregate (str): min, max, mean, median or pN for 0 <= N <= 100.
+        values (list): The numbers, sorted ascending.
+
+    Returns:
+        The aggregate, or None if aggregate is not recognized. min and max
+        give one of the values, the others always give a float. 
+    """
+    if aggregate == 'min':
+        return values[0]
+    if aggregate == 'max':
+        return values[-1]
+    if aggregate == 'mean':
+        return sum(values) / len(values)
+    if aggregate == 'median':
+        aggregate = 'p50'
+    if aggregate[0] == 'p' and aggregate[1:].isdecimal() and \
+    int(aggregate[1:]) <= 100:
+        # Linear interpolation between the two closest ranks
+        rank = (len(values) - 1) * int(aggregate[1:]) / 100
+        low = int(rank)
+        if low == rank:
+            return float(values[low])
+        return values[low] + (values[low + 1] - values[low]) * (rank - low)
+    return None
+
+def make_roster(size, num_types=18, seed=120):
+    """Builds a synthetic Pokemon list in the format returned by
+    process_input, for benchmarking. 
+
+    Args:
+        size (int): The number of Pokemon.
+        num_types (int): The number of distinct types.
+        seed (int): The seed for the random stats so runs are repeatable.
+
+    Returns:
+        poke_list (list): A 2D list of Pokemon.
+    """
+    rng = random.Random(seed)
+    poke_list = []
+    for number in range(size):
+        stats = [rng.randint(5, 255) for _ in range(6)]
+        poke_list.append([str(number), "Poke" + str(number),
+                          "Type" + str(rng.randrange(num_types)), ""] +
+                         [str(sum(stats))] + [str(stat) for stat in stats] +
+                         [str(rng.randint(1, 9)), "False"])
+    return poke_list
+
+def benchmark_backends(sizes=(10000, 100000, 500000), seed=120):
+    """Times building each aggregates backend on a synthetic roster, checks
+    that every backend gives the same answers, and prints a small table.
+
+    Args:
+        sizes (tuple): The roster sizes to time.
+        seed (int): The seed for the random stats so runs are repeatable.
+
+    Returns:
+        results (dict): Maps (backend, size) to the build time in seconds.
+    """
+    results = {}
+    for size in sizes:
+        poke_dict = make_dict(make_roster(size, seed=seed))
+        answers = None
+        for backend, cls in BACKENDS.items():
+            if cls is StatsMatrix:
+                try:
+                    _require_numpy()
+                except ImportError:
+                    continue
+            start = time.perf_counter()
+            aggregates = cls(poke_dict)
+            results[(backend, size)] = time.perf_counter() - start
+            backend_answers = [aggregates.answer(stat)
+                               for stat in POKE_STAT_INDICES]
+            if answers is None:
+                answers = backend_answers
+            assert backend_answers == answers, backend + " answers differ"
+            print("{:>6} {:>9} {:.4f}s".format(backend, size,
+                                               results[(backend, size)]))
+    return results
+
+def benchmark_startup(size=100000, seed=120):
+    """Times loading a synthetic roster csv file and aggregating its stats,
+    first by parsing the csv file and then from a warm cache file, and prints
+    both times.
+
+    Args:
+        size (int): The roster size.
+        seed (int): The seed for the random stats so runs are repeatable.
+
+    Returns:
+        results (dict): Maps "parse" and "cache" to the time in seconds.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "pokemon.csv")
+        with open(filename, "w") as outfile:
+            for pokemon in make_roster(size, seed=seed):
+                outfile.write(",".join(pokemon) + "\n")
+        load_columns(filename)  # Write the cache file
+        
+        start = time.perf_counter()
+        TypeAggregates(make_dict(process_input(filename)))
+        results["parse"] = time.perf_counter() - start
+        start = time.perf_counter()
+        TypeAggregates.from_columns(load_columns(filename))
+        results["cache"] = time.perf_counter() - start
+    for source, seconds in results.items():
+        print("{:>6} {:>9} {:.4f}s".format(source, size, seconds))
+    return results
+
+def answer_queries(queries, columns, aggregates):
+    """Answers a stream of query lines in order. Identical queries are only
+    answered once between roster updates; later copies reuse the answer. 
+
+    Args:
+        queries (iterable): The query lines, without line endings.
+        columns (PokeColumns): The parsed Pokemon columns.
+        aggregates (TypeAggregates or StatsMatrix): The aggregates of the
+        columns.
+
+    Yields:
+        str: The answer to each query, None for an update line, or an empty
+        string for an update line that could not be applied.
+    """
+    engine = None  # Only built if a query needs the whole dictionary
+    answers = {}
+    for query in queries:
+        # Update lines change the roster and print nothing
+        words = query.split()
+        if words and words[0].lower() in UPDATE_COMMANDS:
+            if not isinstance(aggregates, TypeAggregates):
+                # Only TypeAggregates can be updated in place
+                aggregates = TypeAggregates(columns.to_dict())
+            try:
+                apply_update(query, columns.to_dict(), aggregates)
+            except (KeyError, ValueError):
+                # A bad update changes nothing and prints an empty line,
+                # like any other unrecognized query
+                yield ""
+                continue
+            engine = None
+            answers = {}
+            yield None
+            continue
+        key = " ".join(words).lower()
+        if key not in answers:
+            # A single stat name asks for the types with the max average
+            if len(words) <= 1:
+                answers[key] = print_max_averages(query, None, aggregates)
+            else:
+                if engine is None:
+                    engine = QueryEngine(columns.to_dict())
+                answers[key] = engine.run(query)
+        yield answers[key]
+
+def run_batch(lines, columns, aggregates, outfile):
+    """Answers every query in lines and writes the answers in order through
+    outfile, exactly as the interactive loop in main() prints them. Queries
+    end at the first empty line, like in main(). 
+
+    Args:
+        lines (list): The query lines, without line endings.
+        columns (PokeColumns): The parsed Pokemon columns.
+        aggregates (TypeAggregates or StatsMatrix): The aggregates of the
+        columns.
+        outfile (file): An open, buffered text file to write to.
+    """
+    if "" in lines:
+        lines = lines[:lines.index("")]
+    for results in answer_queries(lines, columns, aggregates):
+        if results is not None:
+            outfile.write(results)
+            outfile.write("\n")
+
+def main(backend='dict', use_cache=True, batch=None):
     """ Initializes every function with the appropriate argument to ensure
     each function returns the desired output from the user. Also handels edge
     case for user input. 
+
+    Args:
+        backend (str): The class used to aggregate the stats, one of the keys
+        of BACKENDS.
+        use_cache (bool): Whether to use the binary cache of the csv file.
+        batch (str): If given, read all queries at once and answer them with
+        run_batch(). "-" reads them from standard input after the file
+        name; anything else is the name of a file of queries. 
     """    
-    filename = input()
-    pokemon_2d_list = process_input(filename)
-    poke_dict = make_dict(pokemon_2d_list)
+    if batch == "-":
+        lines = sys.stdin.read().splitlines()
+        filename, lines = (lines[0], lines[1:]) if lines else ("", [])
+    else:
+        filename = input()
+    columns = load_columns(filename, use_cache)
+    # Aggregate the stats once so each query is a lookup
+    aggregates = BACKENDS[backend].from_columns(columns)
+    
+    if batch is not None:
+        if batch != "-":
+            with open(batch, "r") as infile:
+                lines = infile.read().splitlines()
+        sys.stdout.flush()
+        with open(sys.stdout.fileno(), "w", buffering=1 << 16,
+                  closefd=False) as outfile:
+            run_batch(lines, columns, aggregates, outfile)
+        return
     
-    while True:
-        query = input()
-        if not query:
-            break  # Exit the loop if the query is an empty line
-        results = print_max_averages(query, poke_dict)
-        print(results)
-
-main()
\ No newline at end of file
+    # Exit the loop at the first empty line
+    for results in answer_queries(iter(input, ""), columns, aggregates):
+        if results is not None:
+            print(results)
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Answer max average stat queries about Pokemon types. "
+                    "The csv file name and the queries are read from "
+                    "standard input.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        default="dict", help="how to aggregate the stats")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="always parse the csv file")
+    parser.add_argument("--batch", nargs="?", const="-", default=None,
+                        metavar="QUERY_FILE",
+                        help="read every query at once, from QUERY_FILE or "
+                             "else from standard input, and buffer the "
+                             "output")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.backend, args.use_cache, args.batch)
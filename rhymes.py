@@ -4,31 +4,133 @@ File: rhymes.py
 Purpose: This program takes a csv file of words and corresponding phonemes and
 organizes the data into a dictionary. This dictionary is used to find perfect
 rhymes for any given word by verifying certain rhyme conditions using the 
-phonemes while checking another word against a user query word input. 
+phonemes while checking another word against a user query word input. A rhyme
+index built once from the dictionary keeps each query to the words that share
+a rhyme key with the query word. The parsed dictionary and index can be saved
+to a prebuilt index file that later runs memory-map instead of parsing. A
+trie of reversed pronunciations answers near rhyme queries. 
 Course: CSC120 FALL 2024
 """
+import argparse
+import gc
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+
+class PhonemeDict(dict):
+    """This class is the phoneme dictionary built by process_input. It maps
+    each word to a list of its pronunciations, and interns every distinct 
+    phoneme string as a small integer id, so each pronunciation is stored as
+    a bytes object with one byte per phoneme. 
+
+    The CMU dictionary only uses about 70 distinct phonemes (vowels with 
+    their stress markers and consonants), so every id fits in a byte and the
+    suffix comparisons in perfect_rhyme become byte slice comparisons. 
+    """
+    def __init__(self):
+        super().__init__()
+        self.symbols = []  # The phoneme string for each id
+        self.ids = {}  # The id for each phoneme string
+
+    def encode(self, phonemes):
+        """Converts a list of phoneme strings to bytes of phoneme ids, adding
+        new phonemes to the symbol table.
+
+        Args:
+            phonemes (list): The phonemes of a pronunciation.
+
+        Raises:
+            ValueError: If there are more than 256 distinct phonemes.
+
+        Returns:
+            bytes: One phoneme id per phoneme.
+        """
+        ids = self.ids
+        try:
+            return bytes(map(ids.__getitem__, phonemes))
+        except KeyError:
+            # Intern the new phonemes, which is rare after the first lines
+            for phoneme in phonemes:
+                if phoneme not in ids:
+                    if len(self.symbols) == 256:
+                        raise ValueError("More than 256 distinct phonemes")
+                    ids[phoneme] = len(self.symbols)
+                    self.symbols.append(phoneme)
+            return bytes(map(ids.__getitem__, phonemes))
+
+    def decode(self, encoded):
+        """Converts bytes of phoneme ids back to a list of phoneme strings.
+        """
+        return [self.symbols[phoneme_id] for phoneme_id in encoded]
+
+class Pronunciation:
+    """This class is one pronunciation of a word: its phonemes as bytes of
+    phoneme ids and where its primary stress is. The stress is found once 
+    when the pronunciation is loaded, so get_stress does not rescan the 
+    phonemes. 
+    """
+    __slots__ = ("phonemes", "stress_index", "stress_id")
+
+    def __init__(self, phonemes, phoneme_dict):
+        """Encodes the phonemes and finds the first phoneme with the primary
+        stress marker "1". Both stress attributes are None when there is no
+        primary stress. 
+
+        Args:
+            phonemes (list): The phonemes of the pronunciation as strings.
+            phoneme_dict (PhonemeDict): The dictionary whose symbol table the
+            phonemes are interned in.
+        """
+        self.phonemes = phoneme_dict.encode(phonemes)
+        self.stress_index, stress_phoneme = find_stress(phonemes)
+        self.stress_id = None if stress_phoneme is None \
+        else phoneme_dict.ids[stress_phoneme]
+
+def find_stress(phonemes):
+    """This function scans one pronunciation for its stressed vowel.
+
+    Args:
+        phonemes (list): The phonemes of a pronunciation.
+
+    Returns:
+        tuple: The index of the first phoneme with a primary stress marker
+        and that phoneme, or (None, None) if there is none. 
+    """
+    i = 0
+    while i < len(phonemes):
+        if "1" in phonemes[i]:  # Check for primary stress marker
+            return i, phonemes[i]
+        i += 1
+    return None, None
+
 def process_input(infile):
     """This function builds the phoneme dictionary from a csv file input. It
     organizes and cleans the data line by line, adding the full word as a 
     key in the dictionary and initiating the dictionary values as a 2D list. 
     This accounts for multiple pronunciations of a word to be retrieved as 
-    sublists. 
+    sublists. Each pronunciation is stored as a Pronunciation, which holds
+    its interned phonemes and its stress.
 
     Args:
         infile (.csv file): A CSV file containing words and their phonemes.
 
     Returns:
-        phoneme_dict (dict): A dictionary with words as keys and their 
-        pronunciation(s) in a 2D list. 
+        phoneme_dict (PhonemeDict): A dictionary with words as keys and 
+        a list of their pronunciation(s) as values. 
     """
     pfile = open(infile, "r")
-    phoneme_dict = {}
+    phoneme_dict = PhonemeDict()
     for line in pfile:
         # 2D List where first is the word, rest are phonemes
         phoneme_data = line.strip().split()
         # Initiate dictionary key value pairs
         word_key = phoneme_data[0]
-        phoneme_values = phoneme_data[1:]
+        phoneme_values = Pronunciation(phoneme_data[1:], phoneme_dict)
         
         # if-else block to handle duplicate keys
         if word_key not in phoneme_dict:
@@ -44,15 +146,15 @@ def get_phonemes(word, phoneme_dict):
 
     Args:
         word (str): Any string input, valid if found in the dictionary.
-        phoneme_dict (dict): A dictionary with words as keys and their 
-        pronunciation(s) in a 2D list.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
 
     Returns:
         list: A 2D list containing multiple or one pronunciation of a word, 
         represented as phonemes. 
     """
     if word in phoneme_dict:
-        return phoneme_dict[word]
+        return [phoneme_dict.decode(pronunciation.phonemes)
+                for pronunciation in phoneme_dict[word]]
 
 def get_stress(word, phoneme_dict):
     """This function finds the stressed vowel for a word utilizing its 
@@ -61,8 +163,7 @@ def get_stress(word, phoneme_dict):
 
     Args:
         word (str): Any string input, valid if found in the dictionary.
-        phoneme_dict (dict): A dictionary with words as keys and their 
-        pronunciation(s) in a 2D list.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
 
     Returns:
         stressed_positions(list): A list of indices in the word argument's 
@@ -70,24 +171,35 @@ def get_stress(word, phoneme_dict):
         stressed_phonemes(list): A list of the actual phonemes that are the
         stressed vowel in a given word.  
     """
-    word_phonemes = get_phonemes(word, phoneme_dict)
+    stressed_positions, stressed_ids = get_stress_ids(word, phoneme_dict)
+    stressed_phonemes = [phoneme_dict.symbols[stress_id]
+                         for stress_id in stressed_ids]
+    return stressed_positions, stressed_phonemes  # ([indices], [phonemes])
+
+def get_stress_ids(word, phoneme_dict):
+    """This function is get_stress with the stressed phonemes as phoneme ids,
+    read from the values stored in each Pronunciation. 
 
+    Args:
+        word (str): Any string input, valid if found in the dictionary.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
+
+    Returns:
+        stressed_positions(list): The index of the stressed vowel in each
+        pronunciation that has one.
+        stressed_ids(list): The phoneme id of each of those stressed vowels.
+    """
     # To store the index of the stressed vowel for each pronunciation
     stressed_positions = [] 
-    stressed_phonemes = []
-
-    # Loop over each pronunciation (sublist of phonemes)
-    for pronunciation in word_phonemes:
-        i = 0 
-        while i < len(pronunciation):
-            phoneme = pronunciation[i]
-            if "1" in phoneme:  # Check for primary stress marker
-                stressed_positions.append(i)
-                stressed_phonemes.append(phoneme)  # Append the full phoneme
-                break  # Stop once we find the first stressed vowel
-            i += 1
+    stressed_ids = []
+
+    # Loop over each pronunciation, skipping those with no primary stress
+    for pronunciation in phoneme_dict.get(word):
+        if pronunciation.stress_index is not None:
+            stressed_positions.append(pronunciation.stress_index)
+            stressed_ids.append(pronunciation.stress_id)
     
-    return stressed_positions, stressed_phonemes  # ([indices], [phonemes])
+    return stressed_positions, stressed_ids
     
 def perfect_rhyme(word1, word2, phoneme_dict):
     """This function is the core of the program. It utilizes any getters to 
@@ -95,24 +207,26 @@ def perfect_rhyme(word1, word2, phoneme_dict):
     rhymes. It utilizes the phoneme dictionary and the getters to find the 
     stressed vowel and index in the word phoneme list it occurs in. It then
     uses the information of the stressed vowel and its index to verify across
-    two different words that they are perfect rhymes. 
+    two different words that they are perfect rhymes. The phonemes are 
+    compared as bytes of phoneme ids. 
 
     Args:
         word1, word2 (str): Any string input, valid if found in the dictionary.
-        phoneme_dict (dict): A dictionary with words as keys and their 
-        pronunciation(s) in a 2D list.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
 
     Returns:
         (boolean): Returns true if two words are perfect rhymes and false if
         not the case. 
     """
-    # Get the list of pronunciations for both words
-    phonemes1_list = get_phonemes(word1, phoneme_dict)
-    phonemes2_list = get_phonemes(word2, phoneme_dict)
+    # Get the list of encoded pronunciations for both words
+    phonemes1_list = [pronunciation.phonemes for pronunciation
+                      in phoneme_dict.get(word1)]
+    phonemes2_list = [pronunciation.phonemes for pronunciation
+                      in phoneme_dict.get(word2)]
 
-    # Get the stress indices and stressed phonemes for both words
-    stress_indices1, stress_phonemes1 = get_stress(word1, phoneme_dict)
-    stress_indices2, stress_phonemes2 = get_stress(word2, phoneme_dict)
+    # Get the stress indices and stressed phoneme ids for both words
+    stress_indices1, stress_phonemes1 = get_stress_ids(word1, phoneme_dict)
+    stress_indices2, stress_phonemes2 = get_stress_ids(word2, phoneme_dict)
 
     # Iterate over all pronunciations of word1
     for phonemes1 in phonemes1_list:
@@ -141,46 +255,668 @@ def perfect_rhyme(word1, word2, phoneme_dict):
 
     return False
 
-def find_perfect_rhymes(word, phoneme_dict):
-    """This function iterates over the entire phoneme_dict to find perfect
-    rhymes for a word input. This function is the one that finds the rhyming 
-    words while perfect_rhyme just verifies their condition as rhymes. 
+def build_rhyme_index(phoneme_dict):
+    """This function builds the rhyme index used by find_perfect_rhymes. 
+    Every pronunciation of a word is paired with every stressed vowel 
+    get_stress finds for that word, exactly the pairs perfect_rhyme 
+    compares. Each pair gives a rhyme key, the stressed vowel together with
+    the phonemes from the stress index onwards, and the index maps that key
+    to the words sharing it and the phoneme before the stress index.
+
+    Args:
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
+
+    Returns:
+        rhyme_index (dict): A dictionary with rhyme keys as keys and a list
+        of (word, preceding phoneme) tuples as values. A rhyme key is the
+        stressed phoneme id and the bytes of phoneme ids from the stress
+        index onwards. 
+    """
+    rhyme_index = {}
+    for word in phoneme_dict:
+        for key, preceding in get_rhyme_keys(word, phoneme_dict):
+            if key not in rhyme_index:
+                rhyme_index[key] = [(word, preceding)]
+            else:
+                rhyme_index[key].append((word, preceding))
+    return rhyme_index
+
+def get_rhyme_keys(word, phoneme_dict):
+    """This function lists the rhyme keys of a word with the phoneme before
+    the stress index for each, as used by build_rhyme_index. 
+
+    Args:
+        word (str): Any string input, valid if found in the dictionary.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
+
+    Returns:
+        list: A list of (rhyme key, preceding phoneme) tuples, where the
+        preceding phoneme is a bytes slice that is empty at the start of a
+        word. 
+    """
+    stress_indices, stress_ids = get_stress_ids(word, phoneme_dict)
+    rhyme_keys = []
+    for pronunciation in phoneme_dict[word]:
+        phonemes = pronunciation.phonemes
+        i = 0
+        while i < len(stress_indices):
+            stress_idx = stress_indices[i]
+            key = (stress_ids[i], phonemes[stress_idx:])
+            preceding = phonemes[stress_idx-1:stress_idx]
+            rhyme_keys.append((key, preceding))
+            i += 1
+    return rhyme_keys
+
+def find_perfect_rhymes(word, phoneme_dict, rhyme_index=None):
+    """This function finds the perfect rhymes for a word input. Rather than
+    checking every word in phoneme_dict with perfect_rhyme, it only looks at
+    the words sharing a rhyme key with the input word, and keeps those with
+    a different phoneme before the stress, which is the same condition
+    perfect_rhyme checks. 
     
     Args:
         word (str): Any string input, valid if found in the dictionary.
-        phoneme_dict (dict): A dictionary with words as keys and their 
-        pronunciation(s) in a 2D list.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
+        rhyme_index (dict): The index of phoneme_dict built by 
+        build_rhyme_index. It is built here when not given, so pass it in
+        when finding rhymes for more than one word. It may also be a 
+        MappedRhymeIndex, which answers on its own without phoneme_dict.
 
     Returns:
         perfect_rhymes(list): A sorted list of words that perfectly rhyme with
         the input word. 
     """
-    perfect_rhymes = []
-    for other_word in phoneme_dict:
-        # Words must not match and must return True in perfect_rhyme()
-        if word != other_word and \
-        perfect_rhyme(word, other_word, phoneme_dict):
-            perfect_rhymes.append(other_word)
+    if isinstance(rhyme_index, MappedRhymeIndex):
+        return rhyme_index.find_perfect_rhymes(word)
+    if word not in phoneme_dict:
+        return []
+    if rhyme_index is None:
+        rhyme_index = build_rhyme_index(phoneme_dict)
+    
+    # Group the preceding phonemes of the input word by rhyme key
+    word_keys = {}
+    for key, preceding in get_rhyme_keys(word, phoneme_dict):
+        word_keys.setdefault(key, set()).add(preceding)
+    
+    perfect_rhymes = set()
+    for key, word_preceding in word_keys.items():
+        for other_word, preceding in rhyme_index.get(key, []):
+            # Words must not match and some pair must differ before the
+            # stressed vowel
+            if other_word != word and word_preceding != {preceding}:
+                perfect_rhymes.add(other_word)
     # Sort the results to meet the desired output criteria
     return sorted(perfect_rhymes)    
         
-def main():
+# magic, source mtime (ns), source size, the number of words,
+# pronunciations, rhyme keys and index entries, and the byte lengths of the
+# symbol, word, phoneme and rhyme key tables
+INDEX_HEADER = struct.Struct("<8s10q")
+INDEX_MAGIC = b"RHYMIDX" + (b"L" if sys.byteorder == "little" else b"B")
+
+def index_path(infile):
+    """Returns the name of the prebuilt index file for a dictionary file."""
+    return infile + ".rhymeidx"
+
+def _source_key(infile):
+    status = os.stat(infile)
+    return status.st_mtime_ns, status.st_size
+
+def _string_table(items):
+    """Packs byte strings into an offsets array and one blob."""
+    offsets = array("q", [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    return offsets, b"".join(items)
+
+def write_index_file(infile, phoneme_dict=None, rhyme_index=None):
+    """This function is the offline build step for MappedRhymeIndex. It 
+    writes the parsed dictionary and its rhyme groupings to a binary index
+    file next to the dictionary file, stamped with the dictionary file's
+    mtime and size. 
+
+    Words and rhyme keys are stored sorted in string tables with offsets,
+    so the loader can binary search them, and pronunciations are stored as
+    packed phoneme ids. 
+
+    Args:
+        infile (.csv file): A CSV file containing words and their phonemes.
+        phoneme_dict (PhonemeDict): The parsed dictionary, parsed here when
+        not given.
+        rhyme_index (dict): Its rhyme index, built here when not given.
+
+    Returns:
+        str: The name of the index file.
+    """
+    key_stamp = _source_key(infile)
+    if phoneme_dict is None:
+        phoneme_dict = process_input(infile)
+    if rhyme_index is None:
+        rhyme_index = build_rhyme_index(phoneme_dict)
+    
+    # Words sorted by their UTF-8 bytes, which is also str sort order
+    words = sorted(phoneme_dict, key=lambda word: word.encode())
+    word_ids = {word: word_id for word_id, word in enumerate(words)}
+    word_offsets, word_blob = _string_table([word.encode() for word in words])
+    pron_start = array("q", [0])
+    stress_index = array("i")
+    stress_id = array("h")
+    phonemes = []
+    for word in words:
+        for pronunciation in phoneme_dict[word]:
+            phonemes.append(pronunciation.phonemes)
+            has_stress = pronunciation.stress_index is not None
+            stress_index.append(pronunciation.stress_index
+                                if has_stress else -1)
+            stress_id.append(pronunciation.stress_id if has_stress else -1)
+        pron_start.append(len(phonemes))
+    phoneme_offsets, phoneme_blob = _string_table(phonemes)
+    
+    # A rhyme key is stored as its stressed phoneme id followed by its suffix
+    keys = sorted(rhyme_index, key=lambda key: bytes([key[0]]) + key[1])
+    key_offsets, key_blob = _string_table([bytes([key[0]]) + key[1]
+                                           for key in keys])
+    entry_start = array("q", [0])
+    entry_word = array("i")
+    entry_prev = array("h")
+    for key in keys:
+        for word, preceding in rhyme_index[key]:
+            entry_word.append(word_ids[word])
+            entry_prev.append(preceding[0] if preceding else -1)
+        entry_start.append(len(entry_word))
+    symbol_blob = "\n".join(phoneme_dict.symbols).encode()
+    
+    header = INDEX_HEADER.pack(INDEX_MAGIC, key_stamp[0], key_stamp[1],
+                               len(words), len(phonemes), len(keys),
+                               len(entry_word), len(symbol_blob),
+                               len(word_blob), len(phoneme_blob),
+                               len(key_blob))
+    path = index_path(infile)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(header)
+            # Widest items first so every array stays aligned
+            for section in (word_offsets, pron_start, phoneme_offsets,
+                            key_offsets, entry_start, stress_index,
+                            entry_word, stress_id, entry_prev, symbol_blob,
+                            word_blob, phoneme_blob, key_blob):
+                outfile.write(section)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+class MappedRhymeIndex:
+    """This class answers perfect rhyme queries straight from an index file
+    written by write_index_file, which it memory-maps. Nothing is parsed at
+    load time; each query binary searches the sorted word and rhyme key
+    tables and reads only the pages it needs. The answers are the same as
+    find_perfect_rhymes on the parsed dictionary. 
+    """
+    def __init__(self, path):
+        """Maps an index file.
+
+        Args:
+            path (str): The name of the index file.
+
+        Raises:
+            ValueError: If the file is not a complete index file.
+        """
+        self._path = path
+        with open(path, "rb") as infile:
+            self._buffer = mmap.mmap(infile.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        if len(self._buffer) < INDEX_HEADER.size:
+            raise ValueError("Not a rhyme index file: " + path)
+        (magic, self.mtime, self.size, words, prons, keys, entries,
+         *lengths) = INDEX_HEADER.unpack_from(self._buffer)
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a rhyme index file: " + path)
+        
+        view = memoryview(self._buffer)
+        offset = INDEX_HEADER.size
+        sections = []
+        for code, count in (("q", words + 1), ("q", words + 1),
+                            ("q", prons + 1), ("q", keys + 1),
+                            ("q", keys + 1),
+                            ("i", prons), ("i", entries), ("h", prons),
+                            ("h", entries)):
+            end = offset + count * array(code).itemsize
+            # A truncated file would end a section early
+            if count < 0 or end > len(self._buffer):
+                raise ValueError("Not a complete rhyme index file: " + path)
+            sections.append(view[offset:end].cast(code))
+            offset = end
+        (self._word_offsets, self._pron_start, self._phoneme_offsets,
+         self._key_offsets, self._entry_start, self._stress_index,
+         self._entry_word, self._stress_id, self._entry_prev) = sections
+        self._blobs = []
+        for length in lengths:
+            self._blobs.append(offset)
+            offset += length
+        if offset != len(self._buffer):
+            raise ValueError("Not a complete rhyme index file: " + path)
+
+    def __reduce__(self):
+        # Worker processes map the file again instead of copying it
+        return MappedRhymeIndex, (self._path,)
+
+    def _table_item(self, offsets, blob, item):
+        start = self._blobs[blob]
+        return self._buffer[start + offsets[item]:start + offsets[item + 1]]
+
+    def _find(self, offsets, blob, target):
+        """Binary searches a sorted string table for target bytes and 
+        returns its position, or -1 if it is missing.
+        """
+        count = len(offsets) - 1
+        position = bisect_left(range(count), target, key=lambda item:
+                               self._table_item(offsets, blob, item))
+        if position < count and \
+        self._table_item(offsets, blob, position) == target:
+            return position
+        return -1
+
+    def word(self, word_id):
+        """Returns the word with a word id."""
+        return self._table_item(self._word_offsets, 1, word_id).decode()
+
+    def find_perfect_rhymes(self, word):
+        """Finds the perfect rhymes for a word input, as find_perfect_rhymes
+        does.
+
+        Args:
+            word (str): Any string input, valid if found in the dictionary.
+
+        Returns:
+            perfect_rhymes(list): A sorted list of words that perfectly rhyme
+            with the input word. 
+        """
+        word_id = self._find(self._word_offsets, 1, word.encode())
+        if word_id == -1:
+            return []
+        first = self._pron_start[word_id]
+        last = self._pron_start[word_id + 1]
+        stresses = [(self._stress_index[pron], self._stress_id[pron])
+                    for pron in range(first, last)
+                    if self._stress_index[pron] != -1]
+        
+        # Group the preceding phonemes of the input word by rhyme key, from
+        # the same pronunciation and stress pairs as get_rhyme_keys
+        word_keys = {}
+        for pron in range(first, last):
+            phonemes = self._table_item(self._phoneme_offsets, 2, pron)
+            for stress_idx, stress_phoneme in stresses:
+                key = bytes([stress_phoneme]) + phonemes[stress_idx:]
+                preceding = phonemes[stress_idx-1:stress_idx]
+                word_keys.setdefault(key, set()).add(
+                    preceding[0] if preceding else -1)
+        
+        rhyme_ids = set()
+        for key, word_preceding in word_keys.items():
+            key_id = self._find(self._key_offsets, 3, key)
+            if key_id == -1:
+                continue
+            for entry in range(self._entry_start[key_id],
+                               self._entry_start[key_id + 1]):
+                if self._entry_word[entry] != word_id and \
+                word_preceding != {self._entry_prev[entry]}:
+                    rhyme_ids.add(self._entry_word[entry])
+        # Word ids follow sorted word order
+        return [self.word(rhyme_id) for rhyme_id in sorted(rhyme_ids)]
+
+def load_index_file(infile):
+    """This function maps the prebuilt index file of a dictionary file, if
+    there is one and it was built from the dictionary file as it is now. 
+
+    Args:
+        infile (.csv file): A CSV file containing words and their phonemes.
+
+    Returns:
+        MappedRhymeIndex: The mapped index, or None if the index file is
+        missing, invalid, or older than a change to the dictionary file.
+    """
+    try:
+        rhyme_index = MappedRhymeIndex(index_path(infile))
+    except (OSError, ValueError):
+        return None
+    if (rhyme_index.mtime, rhyme_index.size) != _source_key(infile):
+        return None
+    return rhyme_index
+
+class RhymeTrie:
+    """This class is a trie over the reversed pronunciations in the phoneme
+    dictionary, so words that end in the same phonemes share a path from 
+    the root. Each node stores the (word, pronunciation) pairs whose 
+    reversed pronunciation ends there, and the words sharing the last k 
+    phonemes of a pronunciation are the ones stored in the subtree k levels
+    down its path. 
+
+    Besides perfect rhymes, with the same answers as find_perfect_rhymes, it
+    answers near rhyme queries: the words sharing a suffix of at least k 
+    phonemes, and the words ranked by how long a suffix they share. 
+    """
+    __slots__ = ("_root", "_phoneme_dict")
+
+    def __init__(self, phoneme_dict):
+        """Inserts every pronunciation of every word, reversed.
+
+        Args:
+            phoneme_dict (PhonemeDict): The phoneme dictionary.
+        """
+        self._phoneme_dict = phoneme_dict
+        self._root = _TrieNode()
+        for word, pronunciations in phoneme_dict.items():
+            for pronunciation in pronunciations:
+                node = self._root
+                for phoneme_id in reversed(pronunciation.phonemes):
+                    node = node.child(phoneme_id)
+                node.add_entry((word, pronunciation))
+
+    def _path(self, phonemes):
+        """Returns the nodes along the reversed path of a pronunciation,
+        starting with the root. 
+        """
+        nodes = [self._root]
+        for phoneme_id in reversed(phonemes):
+            nodes.append(nodes[-1].children[phoneme_id])
+        return nodes
+
+    def words_with_suffix(self, word, k):
+        """Finds the words that share at least the last k phonemes with some
+        pronunciation of a word.
+
+        Args:
+            word (str): Any string input, valid if found in the dictionary.
+            k (int): The least number of final phonemes to share.
+
+        Raises:
+            ValueError: If k is negative.
+
+        Returns:
+            list: A sorted list of the other words sharing such a suffix.
+        """
+        if k < 0:
+            raise ValueError("k must not be negative")
+        words = set()
+        for pronunciation in self._phoneme_dict.get(word, []):
+            if len(pronunciation.phonemes) >= k:
+                node = self._path(pronunciation.phonemes)[k]
+                for other_word, _ in node.subtree_entries():
+                    words.add(other_word)
+        words.discard(word)
+        return sorted(words)
+
+    def near_rhymes(self, word, count):
+        """Ranks the other words by the longest suffix of phonemes they share
+        with a word, longest first and alphabetically among equals. Words
+        sharing no final phoneme are not ranked. 
+
+        Args:
+            word (str): Any string input, valid if found in the dictionary.
+            count (int): How many words to return at most.
+
+        Returns:
+            list: Up to count (word, shared suffix length) tuples.
+        """
+        paths = [self._path(pronunciation.phonemes) for pronunciation
+                 in self._phoneme_dict.get(word, [])]
+        ranked = []
+        seen = {word}
+        walked = set()
+        depth = max((len(path) - 1 for path in paths), default=0)
+        # Walk up from the deepest shared suffix, so each level adds the
+        # words sharing exactly that many phonemes. The branches on a path
+        # were walked at the deeper levels, so only the node itself and its
+        # other branches are new, and every node is walked at most once
+        while depth > 0 and len(ranked) < count:
+            level = set()
+            for path in paths:
+                if len(path) <= depth or path[depth] in walked:
+                    continue
+                node = path[depth]
+                walked.add(node)
+                for other_word, _ in node.entries_outside(walked):
+                    if other_word not in seen:
+                        level.add(other_word)
+            for other_word in sorted(level)[:count - len(ranked)]:
+                ranked.append((other_word, depth))
+            seen.update(level)
+            depth -= 1
+        return ranked
+
+    def perfect_rhymes(self, word):
+        """Finds the perfect rhymes for a word input with the same answer as
+        find_perfect_rhymes. Each rhyme key of the word is the stressed 
+        vowel and the phonemes from the stress index onwards, so only the
+        subtree under that suffix needs to be checked. 
+
+        Args:
+            word (str): Any string input, valid if found in the dictionary.
+
+        Returns:
+            perfect_rhymes(list): A sorted list of words that perfectly rhyme
+            with the input word. 
+        """
+        if word not in self._phoneme_dict:
+            return []
+        perfect_rhymes = set()
+        for key, preceding in get_rhyme_keys(word, self._phoneme_dict):
+            stress_id, suffix = key
+            node = self._root
+            for phoneme_id in reversed(suffix):
+                node = node.children[phoneme_id]
+            for other_word, pronunciation in node.subtree_entries():
+                if other_word == word or other_word in perfect_rhymes:
+                    continue
+                phonemes = pronunciation.phonemes
+                # The stress pairs are those get_rhyme_keys would give
+                stress_indices, stress_ids = get_stress_ids(
+                    other_word, self._phoneme_dict)
+                for stress_idx, other_id in zip(stress_indices, stress_ids):
+                    if other_id == stress_id and \
+                    phonemes[stress_idx:] == suffix and \
+                    phonemes[stress_idx-1:stress_idx] != preceding:
+                        perfect_rhymes.add(other_word)
+                        break
+        return sorted(perfect_rhymes)
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = None
+
+    def child(self, phoneme_id):
+        node = self.children.get(phoneme_id)
+        if node is None:
+            node = self.children[phoneme_id] = _TrieNode()
+        return node
+
+    def add_entry(self, entry):
+        if self.entries is None:
+            self.entries = [entry]
+        else:
+            self.entries.append(entry)
+
+    def subtree_entries(self):
+        """Yields the entries of this node and every node below it."""
+        return self._walk([self])
+
+    def entries_outside(self, skip):
+        """Yields the entries of this node and of the subtrees below it
+        whose roots are not in skip.
+        """
+        if self.entries is not None:
+            yield from self.entries
+        yield from self._walk([child for child in self.children.values()
+                               if child not in skip])
+
+    @staticmethod
+    def _walk(stack):
+        while stack:
+            node = stack.pop()
+            if node.entries is not None:
+                yield from node.entries
+            stack.extend(node.children.values())
+
+# The dictionary and index shared with batch worker processes. They are set
+# before the pool is created, so forked workers inherit them copy-on-write
+_shared_dict = None
+_shared_index = None
+
+def _init_worker(phoneme_dict, rhyme_index):
+    """Sets the shared dictionary and index in a worker process that was not
+    forked from the parent and so did not inherit them. 
+    """
+    global _shared_dict, _shared_index
+    _shared_dict = phoneme_dict
+    _shared_index = rhyme_index
+
+def _find_shared_rhymes(word):
+    return word, find_perfect_rhymes(word, _shared_dict, _shared_index)
+
+def find_rhymes_batch(words, phoneme_dict, rhyme_index, workers=None):
+    """This function finds the perfect rhymes of many words at once by
+    spreading the words over a pool of worker processes. Where the platform
+    can fork, the workers share the already loaded dictionary and index 
+    copy-on-write instead of receiving a copy. 
+
+    Args:
+        words (list): The query words, already standardized.
+        phoneme_dict (PhonemeDict): The phoneme dictionary.
+        rhyme_index (dict): The index of phoneme_dict built by 
+        build_rhyme_index.
+        workers (int): The number of processes, os.cpu_count() by default.
+        With one worker the words are answered in this process.
+
+    Yields:
+        tuple: Each word with its sorted list of perfect rhymes, in the order
+        of words. 
+    """
+    global _shared_dict, _shared_index
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2:
+        for word in words:
+            yield word, find_perfect_rhymes(word, phoneme_dict, rhyme_index)
+        return
+    
+    pool = None
+    # Only unfreeze if this call froze the objects, and nothing was frozen
+    # before, so objects the caller froze stay frozen
+    thaw = False
+    try:
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            _shared_dict, _shared_index = phoneme_dict, rhyme_index
+            # Keep the garbage collector in the workers from writing to, and
+            # so copying, the pages of the shared objects
+            thaw = gc.get_freeze_count() == 0
+            gc.freeze()
+            pool = context.Pool(workers)
+        else:
+            pool = multiprocessing.Pool(workers, _init_worker,
+                                        (phoneme_dict, rhyme_index))
+        chunksize = max(1, len(words) // (workers * 8))
+        yield from pool.imap(_find_shared_rhymes, words, chunksize)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if thaw:
+            gc.unfreeze()
+        _shared_dict = _shared_index = None
+
+def main(batch=None, workers=None, build_index=False, suffix=None,
+         near=None):
     """The main function is the top level glue that defines any necessary
     information as variables to use in our find_perfect_rhymes() function. 
     It also prompts the user with a silent prompt for a file name and a
     query to find perfect rhymes from. 
     
     Args: 
-        None
+        batch (str): If given, the name of a file with one query word per
+        line. The rhymes of every word are written as one "WORD: RHYME ..."
+        line each, instead of reading a single query. 
+        workers (int): The number of processes for batch queries.
+        build_index (bool): Whether to only parse the file and write its
+        prebuilt index file for later runs, without reading a query.
+        Otherwise a prebuilt index is used when it is up to date with the
+        file. 
+        suffix (int): If given, print the words sharing at least this many
+        final phonemes with the query instead of its perfect rhymes.
+        near (int): If given, print up to this many near rhymes of the query
+        as "WORD LENGTH" lines, ranked by shared suffix length. 
     
     Returns: 
         None
     """
     filename = input() 
-    query = input().strip().upper()  # Ensures query format is standardized
-    phoneme_dict = process_input(filename)
-    perfect_rhymes = find_perfect_rhymes(query, phoneme_dict)
-    for rhyme in perfect_rhymes:
-        print(rhyme)
+    if build_index:
+        # The offline build step reads no query
+        write_index_file(filename)
+        return
+    if batch is None:
+        query = input().strip().upper()  # Ensures query format is standardized
+        if suffix is not None or near is not None:
+            trie = RhymeTrie(process_input(filename))
+            if near is not None:
+                for rhyme, length in trie.near_rhymes(query, near):
+                    print(rhyme, length)
+            else:
+                for rhyme in trie.words_with_suffix(query, suffix):
+                    print(rhyme)
+            return
+    # A fresh prebuilt index answers queries without parsing the file
+    rhyme_index = load_index_file(filename)
+    phoneme_dict = None
+    if rhyme_index is None:
+        phoneme_dict = process_input(filename)
+        rhyme_index = build_rhyme_index(phoneme_dict)
+    if batch is None:
+        perfect_rhymes = find_perfect_rhymes(query, phoneme_dict, rhyme_index)
+        for rhyme in perfect_rhymes:
+            print(rhyme)
+        return
     
-main()
\ No newline at end of file
+    with open(batch, "r") as infile:
+        words = [line.strip().upper() for line in infile if line.strip()]
+    sys.stdout.flush()
+    with open(sys.stdout.fileno(), "w", buffering=1 << 16,
+              closefd=False) as outfile:
+        for word, perfect_rhymes in find_rhymes_batch(
+                words, phoneme_dict, rhyme_index, workers):
+            outfile.write(word + ":" + "".join(" " + rhyme for rhyme
+                                              in perfect_rhymes) + "\n")
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the perfect rhymes of a word. The pronouncing "
+                    "dictionary file name and the query word are read from "
+                    "standard input.")
+    parser.add_argument("--batch", metavar="QUERY_FILE", default=None,
+                        help="find the rhymes of every word in QUERY_FILE, "
+                             "one per line, instead of reading a query")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of processes for --batch")
+    parser.add_argument("--build-index", action="store_true",
+                        help="only write a prebuilt index of the dictionary "
+                             "file for faster later runs")
+    parser.add_argument("--suffix", type=int, default=None, metavar="K",
+                        help="print the words sharing at least the last K "
+                             "phonemes with the query")
+    parser.add_argument("--near", type=int, default=None, metavar="N",
+                        help="print the N words sharing the longest final "
+                             "phonemes with the query")
+    args = parser.parse_args(argv)
+    if args.suffix is not None and args.suffix < 0:
+        parser.error("--suffix must not be negative")
+    return args
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.batch, args.workers, args.build_index, args.suffix, args.near)